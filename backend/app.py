@@ -50,14 +50,15 @@ IM_PATH = os.environ.get(
     "IMAGEMAGICK_BINARY",
     r"C:\Program Files\ImageMagick-7.1.1-Q16\magick.exe"
 )
+# moviepy يقرأ IMAGEMAGICK_BINARY من البيئة عند أول استيراد، لذا يكفي ضبطه هنا
 os.environ["IMAGEMAGICK_BINARY"] = IM_PATH
-try:
-    subprocess.run([IM_PATH, "-version"], check=True, capture_output=True, text=True)
-    print("✅ ImageMagick:", IM_PATH)
-except Exception as e:
-    print("⚠️ Failed to verify ImageMagick:", e)
-from moviepy.config import change_settings
-change_settings({"IMAGEMAGICK_BINARY": IM_PATH})
+
+def verify_imagemagick():
+    try:
+        subprocess.run([IM_PATH, "-version"], check=True, capture_output=True, text=True)
+        print("✅ ImageMagick:", IM_PATH)
+    except Exception as e:
+        print("⚠️ Failed to verify ImageMagick:", e)
 
 # -----------------------------------------------------------------------------
 # 3. إعداد مسارات المجلدات
@@ -104,8 +105,29 @@ def set_language():
 # -----------------------------------------------------------------------------
 from database import init_app as init_db_app, init_db
 init_db_app(app)
-with app.app_context():
-    init_db()
+
+from utils import warmup
+
+if warmup.STARTUP_MODE == "eager":
+    with app.app_context():
+        init_db()
+else:
+    # في وضع الإقلاع السريع تُهيأ الجداول مع أول طلب بدل وقت الاستيراد.
+    # القفل يمنع عدة threads من تنفيذ الترحيل (ALTER TABLE) معًا في أول الطلبات
+    import threading
+
+    _db_ready = False
+    _db_lock = threading.Lock()
+
+    @app.before_request
+    def ensure_db():
+        global _db_ready
+        if _db_ready:
+            return
+        with _db_lock:
+            if not _db_ready:
+                init_db()
+                _db_ready = True
 
 # -----------------------------------------------------------------------------
 # 8. تسجيل Blueprints
@@ -136,6 +158,26 @@ for bp in (
 ):
     app.register_blueprint(bp)
 
+# -----------------------------------------------------------------------------
+# 8.1 تسخين المكتبات والنماذج الثقيلة (خلفيًا أو فورًا حسب STARTUP_MODE)
+# -----------------------------------------------------------------------------
+def warm_tts_client():
+    # فتح قنوات TextToSpeech مسبقًا في هذه العملية
+    from utils.tts import warm_up
+    warm_up()
+
+warmup.register("imagemagick", verify_imagemagick)
+for module_name in ("whisper", "moviepy.editor", "yt_dlp", "google.cloud.texttospeech"):
+    warmup.register_import(module_name)
+warmup.register_models()
+warmup.register("tts:client", warm_tts_client)
+warmup.start()
+
+@app.route("/api/ready")
+def readiness():
+    info = warmup.status()
+    return jsonify(info), 200 if info["ready"] else 503
+
 # -----------------------------------------------------------------------------
 # 9. مسارات لخدمة الملفات الثابتة وSPA
 # -----------------------------------------------------------------------------
@@ -147,6 +189,12 @@ def serve_output(filename):
 def serve_audio(filename):
     return send_from_directory(FOLDERS["audio"], filename)
 
+# كاش TTS له مجلده الخاص (utils.tts_cache.CACHE_DIR) وروابطه تحت /output/audio/tts-cache/
+@app.route("/output/audio/tts-cache/<path:filename>")
+def serve_tts_cache(filename):
+    from utils.tts_cache import CACHE_DIR
+    return send_from_directory(CACHE_DIR, filename)
+
 @app.route("/assets/<path:filename>")
 def serve_assets(filename):
     return send_from_directory(os.path.join(FOLDERS["static"], "assets"), filename)
@@ -0,0 +1,86 @@
+# backend/benchmark_asr.py
+"""
+مقارنة سرعة ودقة (WER) محركات ASR على نفس ملفات الاختبار.
+
+الاستخدام:
+    python benchmark_asr.py --fixtures fixtures/asr --size base --backends whisper,whisper-int8
+
+مجلد fixtures يحتوي ملفات صوت/فيديو، وبجانب كل ملف نص مرجعي بنفس الاسم وامتداد .txt.
+"""
+import os
+import re
+import time
+import argparse
+
+from utils.audio_ingest import load_pcm, duration_seconds
+from utils.asr_engine import BACKENDS, create_engine
+
+MEDIA_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".mp4", ".webm", ".mkv")
+
+
+def normalize(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """مسافة Levenshtein على مستوى الكلمات مقسومة على عدد كلمات المرجع."""
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1] / len(ref)
+
+
+def load_fixtures(folder):
+    fixtures = []
+    for name in sorted(os.listdir(folder)):
+        base, ext = os.path.splitext(name)
+        ref_path = os.path.join(folder, base + ".txt")
+        if ext.lower() in MEDIA_EXTENSIONS and os.path.exists(ref_path):
+            with open(ref_path, "r", encoding="utf-8") as f:
+                fixtures.append((name, load_pcm(os.path.join(folder, name)), f.read()))
+    return fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", required=True)
+    parser.add_argument("--size", default="base")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--language", default=None)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        print("❌ No fixtures found (media file + matching .txt reference).")
+        return
+    total_audio = sum(duration_seconds(audio) for _, audio, _ in fixtures)
+    print(f"🎧 {len(fixtures)} fixtures, {total_audio:.1f}s of audio, model size '{args.size}'\n")
+
+    print(f"{'backend':<14}{'load s':>8}{'decode s':>10}{'RTF':>8}{'WER':>8}{'MB':>8}")
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        started = time.perf_counter()
+        engine = create_engine(args.size, backend)
+        load_s = time.perf_counter() - started
+
+        decode_s, errors, words = 0.0, 0.0, 0
+        for name, audio, reference in fixtures:
+            started = time.perf_counter()
+            result = engine.transcribe(audio, args.language)
+            decode_s += time.perf_counter() - started
+            n = len(normalize(reference))
+            errors += word_error_rate(reference, result["text"]) * n
+            words += n
+
+        wer = errors / words if words else 0.0
+        print(f"{backend:<14}{load_s:>8.1f}{decode_s:>10.1f}{decode_s / total_audio:>8.3f}"
+              f"{wer:>8.3f}{engine.memory_mb:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
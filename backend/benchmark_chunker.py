@@ -0,0 +1,94 @@
+# backend/benchmark_chunker.py
+"""
+قياس سرعة وجودة تقسيم النصوص الطويلة (utils.text_chunker) مقارنة بالطريقتين القديمتين:
+split_text (regex يعرف .!? فقط) والقطع كل 4000 حرف.
+
+الاستخدام:
+    python benchmark_chunker.py --mb 4
+    python benchmark_chunker.py --files transcript_ar.txt transcript_zh.txt --limit 4900 --unit bytes
+
+بدون --files يُولَّد نص متعدد اللغات بالحجم المطلوب.
+"""
+import re
+import time
+import random
+import argparse
+
+from utils.text_chunker import chunk_text, measure
+
+SAMPLES = (
+    "This is an English sentence about the video. Is it clear? Yes!",
+    "هذه جملة عربية عن محتوى الفيديو. هل هي واضحة؟ نعم!",
+    "这是关于视频的一句话。清楚吗？是的！",
+    "यह वीडियो के बारे में एक वाक्य है। क्या यह स्पष्ट है? हाँ॥",
+)
+
+
+def legacy_split_text(text, max_length):
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    chunks, current = [], ""
+    for sentence in sentences:
+        if len(current) + len(sentence) + 1 > max_length:
+            if current:
+                chunks.append(current)
+            current = sentence
+        else:
+            current += (" " + sentence) if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def legacy_slice(text, max_length):
+    return [text[i:i + max_length] for i in range(0, len(text), max_length)]
+
+
+def synthetic_text(megabytes, seed=0):
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < megabytes * 1024 * 1024:
+        sample = rng.choice(SAMPLES)
+        parts.append(sample)
+        size += len(sample.encode("utf-8")) + 1
+    return " ".join(parts)
+
+
+def broken_edges(chunks):
+    """عدد الأجزاء التي تنتهي في منتصف جملة (لا تنتهي بعلامة نهاية)."""
+    return sum(1 for chunk in chunks[:-1] if chunk.rstrip()[-1:] not in ".!?…؟۔。！？｡।॥")
+
+
+def run(name, fn, text, limit, unit):
+    started = time.perf_counter()
+    chunks = fn(text, limit)
+    seconds = time.perf_counter() - started
+    over = sum(1 for chunk in chunks if measure(chunk, unit) > limit)
+    print(f"{name:<16}{seconds:>9.3f}{len(chunks):>9}{broken_edges(chunks):>9}{over:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="*")
+    parser.add_argument("--mb", type=float, default=4)
+    parser.add_argument("--limit", type=int, default=4900)
+    parser.add_argument("--unit", choices=("chars", "bytes"), default="chars")
+    args = parser.parse_args()
+
+    if args.files:
+        texts = []
+        for path in args.files:
+            with open(path, "r", encoding="utf-8") as f:
+                texts.append(f.read())
+        text = "\n".join(texts)
+    else:
+        text = synthetic_text(args.mb)
+    print(f"📄 {len(text.encode('utf-8')) / 1024 / 1024:.1f} MB, limit {args.limit} {args.unit}\n")
+
+    print(f"{'method':<16}{'seconds':>9}{'chunks':>9}{'broken':>9}{'over':>9}")
+    run("split_text", legacy_split_text, text, args.limit, args.unit)
+    run("slice", legacy_slice, text, args.limit, args.unit)
+    run("text_chunker", lambda t, n: chunk_text(t, n, args.unit), text, args.limit, args.unit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# backend/benchmark_render.py
+"""
+مقارنة سرعة تصيير الفيديو النهائي (إطار/ثانية) بين تمريرة ffmpeg الواحدة
+(utils.ffmpeg_render) وتركيب moviepy القديم، بنفس الترجمات والعلامة المائية.
+
+الاستخدام:
+    python benchmark_render.py --video sample.mp4 --audio sample.mp3 --subtitles 40 --watermark
+
+--subtitles عدد أسطر ترجمة تجريبية (سطر كل ثانيتين) تُحرق في الفيديو.
+مع --subtitles 0 وبدون --watermark يُنسخ مسار الفيديو كما هو (استبدال الصوت فقط)،
+ويتحقق الاختبار من أن بصمة حزم الفيديو في الناتج مطابقة للأصل.
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from utils import ffmpeg_render, encoding_profiles
+
+WATERMARK = "ECHVID FREE VERSION"
+
+
+def sample_subtitles(count):
+    return [((i * 2, (i + 1) * 2), f"Subtitle line number {i + 1}") for i in range(count)]
+
+
+def render_moviepy(video_path, audio_path, output_path, subtitles, watermark, profile):
+    """نفس تركيب video_tools.render_with_moviepy خارج سياق Flask."""
+    import moviepy.editor as mp
+    from moviepy.editor import TextClip
+    from moviepy.video.tools.subtitles import SubtitlesClip
+
+    video = mp.VideoFileClip(video_path).set_audio(mp.AudioFileClip(audio_path))
+    elements = [video]
+    if subtitles:
+        generator = lambda txt: TextClip(txt, font="Arial", fontsize=24, color="white")
+        elements.append(SubtitlesClip(subtitles, generator).set_pos(("center", "bottom")))
+    if watermark:
+        elements.append(
+            TextClip(watermark, fontsize=40, color="white", font="Arial")
+            .set_duration(video.duration).set_opacity(0.6).set_pos(("center", "top"))
+        )
+    composite = mp.CompositeVideoClip(elements) if len(elements) > 1 else video
+    composite.write_videofile(
+        output_path, codec="libx264", audio_codec="aac", logger=None,
+        **encoding_profiles.moviepy_kwargs(profile)
+    )
+    composite.close()
+    video.close()
+
+
+def render_ffmpeg(video_path, audio_path, output_path, subtitles, watermark, profile):
+    ffmpeg_render.render(video_path, output_path, audio_path, subtitles, watermark, profile=profile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--audio", required=True)
+    parser.add_argument("--subtitles", type=int, default=40)
+    parser.add_argument("--watermark", action="store_true")
+    parser.add_argument("--backends", default="ffmpeg,moviepy")
+    parser.add_argument("--profile", default="standard", choices=list(encoding_profiles.PROFILES))
+    args = parser.parse_args()
+
+    info = ffmpeg_render.probe(args.video)
+    frames = info["duration"] * info["fps"]
+    subtitles = sample_subtitles(args.subtitles)
+    watermark = WATERMARK if args.watermark else None
+    print(f"🎬 {info['width']}x{info['height']}, {info['duration']:.1f}s @ {info['fps']:.2f} fps "
+          f"({frames:.0f} frames), {len(subtitles)} subtitles, watermark={bool(watermark)}, "
+          f"profile={args.profile}\n")
+    _, profile = encoding_profiles.resolve(args.profile)
+
+    renderers = {"ffmpeg": render_ffmpeg, "moviepy": render_moviepy}
+    print(f"{'backend':<10}{'seconds':>10}{'fps':>10}{'MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in [b.strip() for b in args.backends.split(",") if b.strip()]:
+            output_path = os.path.join(tmp, f"{name}.mp4")
+            started = time.perf_counter()
+            renderers[name](args.video, args.audio, output_path, subtitles, watermark, profile)
+            seconds = time.perf_counter() - started
+            size_mb = os.path.getsize(output_path) / 1024 / 1024
+            print(f"{name:<10}{seconds:>10.1f}{frames / seconds:>10.1f}{size_mb:>8.1f}")
+            if name == "ffmpeg" and not subtitles and not watermark:
+                same = ffmpeg_render.video_stream_hash(args.video) == ffmpeg_render.video_stream_hash(output_path)
+                print(f"{'':<10}video stream bit-identical: {'✅' if same else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
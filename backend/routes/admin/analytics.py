@@ -31,3 +31,62 @@ def get_stats():
         import traceback
         traceback.print_exc()
         return jsonify({"error": f"Failed to retrieve analytics: {e}"}), 500
+
+@analytics_bp.route("/models", methods=["GET"])
+def get_model_stats():
+    if not is_admin():
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    from utils.whisper_registry import stats
+    from utils import batch_scheduler
+    data = stats()
+    data["batching"] = batch_scheduler.stats()
+    return jsonify(data)
+
+@analytics_bp.route("/transcript-cache", methods=["GET"])
+def get_transcript_cache_stats():
+    if not is_admin():
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    from utils.transcript_cache import stats
+    return jsonify(stats())
+
+@analytics_bp.route("/translation-memory", methods=["GET"])
+def get_translation_memory_stats():
+    if not is_admin():
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    from utils.translation_memory import stats
+    from utils.translation_executor import stats as upstream_stats
+    from utils import translation_coalescer
+    data = stats()
+    data["upstream"] = upstream_stats()
+    data["coalescing"] = translation_coalescer.stats()
+    return jsonify(data)
+
+@analytics_bp.route("/upstreams", methods=["GET"])
+def get_upstream_stats():
+    if not is_admin():
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    from utils.resilience import stats
+    return jsonify(stats())
+
+@analytics_bp.route("/tts-cache", methods=["GET"])
+def get_tts_cache_stats():
+    if not is_admin():
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    from utils.tts_cache import stats
+    from utils.tts import stats as client_stats
+    data = stats()
+    data["clients"] = client_stats()
+    return jsonify(data)
+
+@analytics_bp.route("/workspaces", methods=["GET"])
+def get_workspace_stats():
+    if not is_admin():
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    from utils.workspace import stats
+    return jsonify(stats())
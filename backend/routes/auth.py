@@ -56,6 +56,7 @@ def login():
                 "user_id": row[0],
                 "username": row[1],
                 "email": email,
+                "plan": row[3],
                 "role": row[4]
             })
 
@@ -81,6 +82,8 @@ def check_auth():
             ).fetchone()
 
             if row:
+                # مزامنة الخطة في الجلسة (قد يغيّرها المسؤول بعد تسجيل الدخول)
+                session["plan"] = row[1]
                 return jsonify({
                     "authenticated": True,
                     "username": row[0],
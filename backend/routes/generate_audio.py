@@ -1,10 +1,9 @@
 print("Using generate_audio.py from:", __file__)
 
 import os
-import uuid
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, send_file, stream_with_context
 from flask_cors import cross_origin
-from werkzeug.utils import secure_filename
+from utils import resilience, tts, tts_cache
 
 AUDIO_TOOL_ENABLED = True
 
@@ -15,12 +14,9 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 AUDIO_FOLDER = os.path.join(BASE_DIR, "audio")
 os.makedirs(AUDIO_FOLDER, exist_ok=True)
 
-@generate_audio_bp.route("/", methods=["POST"])
-@cross_origin(origins="http://localhost:5173", supports_credentials=True)
-def generate_audio():
-    if not AUDIO_TOOL_ENABLED:
-        return jsonify({"message": "Audio generation is under development."}), 200
-
+# قراءة النص واللغة والجنس من الطلب (multipart أو JSON)؛
+# تُرجع (النص، رمز اللغة الكامل، الجنس، رد الخطأ أو None)
+def read_tts_request():
     current_app.logger.debug("Request Content-Type: %s", request.content_type)
 
     # دعم كلا النوعين من البيانات
@@ -38,7 +34,7 @@ def generate_audio():
     current_app.logger.debug("Form Data: %s", form_data)
 
     if not output_lang:
-        return jsonify({"error": "Output language is required."}), 400
+        return None, None, None, (jsonify({"error": "Output language is required."}), 400)
 
     language_map = {
         "ar": "ar-XA", "en": "en-US", "fr": "fr-FR", "de": "de-DE",
@@ -48,7 +44,7 @@ def generate_audio():
 
     lang_code_full = language_map.get(output_lang.lower())
     if not lang_code_full:
-        return jsonify({"error": "Invalid output language."}), 400
+        return None, None, None, (jsonify({"error": "Invalid output language."}), 400)
 
     # قراءة النص من الملف إن لم يكن موجودًا
     if file and not custom_text:
@@ -59,39 +55,80 @@ def generate_audio():
             except UnicodeDecodeError:
                 custom_text = content.decode("cp1256").strip()
         except Exception as e:
-            return jsonify({"error": f"Failed to read file: {e}"}), 400
+            return None, None, None, (jsonify({"error": f"Failed to read file: {e}"}), 400)
 
     if not custom_text:
-        return jsonify({"error": "Text input is required."}), 400
-
-    output_filename = f"audio_{uuid.uuid4().hex[:8]}.mp3"
-    audio_output_path = os.path.join(AUDIO_FOLDER, secure_filename(output_filename))
+        return None, None, None, (jsonify({"error": "Text input is required."}), 400)
 
-    try:
-        from google.cloud import texttospeech
+    return custom_text, lang_code_full, gender, None
 
-        client = texttospeech.TextToSpeechClient()
-        synthesis_input = texttospeech.SynthesisInput(text=custom_text)
-        voice_params = texttospeech.VoiceSelectionParams(
-            language_code=lang_code_full,
-            ssml_gender=getattr(texttospeech.SsmlVoiceGender, gender.upper(), texttospeech.SsmlVoiceGender.NEUTRAL)
-        )
-        audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
+@generate_audio_bp.route("/", methods=["POST"])
+@cross_origin(origins="http://localhost:5173", supports_credentials=True)
+def generate_audio():
+    if not AUDIO_TOOL_ENABLED:
+        return jsonify({"message": "Audio generation is under development."}), 200
 
-        response = client.synthesize_speech(
-            input=synthesis_input,
-            voice=voice_params,
-            audio_config=audio_config
-        )
+    custom_text, lang_code_full, gender, error = read_tts_request()
+    if error:
+        return error
 
-        with open(audio_output_path, "wb") as out:
-            out.write(response.audio_content)
+    try:
+        # نفس النص والصوت يُعاد من الكاش مباشرة؛ وإلا يُولَّد على أجزاء متوازية (utils.tts)
+        audio_output_path, cached = tts_cache.cached_synthesize(custom_text, lang_code_full, gender)
 
+    except resilience.CircuitOpenError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         current_app.logger.error("Synthesis failed: %s", e, exc_info=True)
         return jsonify({"error": f"Audio generation failed: {e}"}), 500
 
     return jsonify({
         "message": "Audio generated successfully",
-        "audio_url": f"/output/audio/{output_filename}"
+        "audio_url": tts_cache.url_for(audio_output_path),
+        "cached": cached
     })
+
+# بث الصوت أثناء توليده (chunked HTTP): كل جزء MP3 يُرسل فور جاهزيته
+# فيبدأ التشغيل قبل انتهاء توليد النص كاملًا. عند الانتهاء يُحفظ الملف في الكاش.
+@generate_audio_bp.route("/stream", methods=["POST"])
+@cross_origin(origins="http://localhost:5173", supports_credentials=True)
+def generate_audio_stream():
+    if not AUDIO_TOOL_ENABLED:
+        return jsonify({"message": "Audio generation is under development."}), 200
+
+    custom_text, lang_code_full, gender, error = read_tts_request()
+    if error:
+        return error
+
+    cached_path = tts_cache.lookup(custom_text, lang_code_full, gender)
+    if cached_path is not None:
+        return send_file(cached_path, mimetype="audio/mpeg", conditional=True)
+
+    # نولّد الجزء الأول قبل إرسال الترويسات حتى تصل أخطاء البداية كرد JSON عادي
+    stream = tts.iter_synthesize(custom_text, lang_code_full, gender)
+    try:
+        first = next(stream)
+    except resilience.CircuitOpenError as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        current_app.logger.error("Synthesis failed: %s", e, exc_info=True)
+        return jsonify({"error": f"Audio generation failed: {e}"}), 500
+
+    def generate():
+        parts = [first]
+        yield first
+        try:
+            for part in stream:
+                parts.append(part)
+                yield part
+        except Exception as e:
+            # الترويسات أُرسلت بالفعل، لذا لا يمكن إلا إنهاء البث وتسجيل الخطأ
+            current_app.logger.error("Streaming synthesis failed: %s", e, exc_info=True)
+            return
+        tts_cache.store(custom_text, lang_code_full, gender, "MP3", b"".join(parts))
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="audio/mpeg",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -4,11 +4,15 @@ import datetime
 import sqlite3
 import uuid
 import traceback
-import moviepy.editor as mp
-import whisper
-from yt_dlp import YoutubeDL
-from deep_translator import GoogleTranslator
+from concurrent.futures import ThreadPoolExecutor
 from celery import Celery
+from utils.audio_ingest import load_pcm, duration_seconds, NoAudioStreamError
+from utils.model_policy import choose_model, track_job
+from utils.transcript_cache import audio_hash, cached_transcribe
+from utils.language_id import resolve_language, same_language
+from utils import segment_store, tts_cache, ffmpeg_render, encoding_profiles
+from utils.workspace import Workspace
+from utils.translation import translate_text
 
 # إعداد مسار المشروع والمجلدات الضرورية
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -16,6 +20,9 @@ UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
 OUTPUT_FOLDER = os.path.join(BASE_DIR, "output")
 AUDIO_FOLDER = os.path.join(BASE_DIR, "audio")
 
+# حجم نموذج Whisper المفضّل في العملية الكاملة (قد تنزل السياسة لحجم أصغر تحت الحمل)
+WHISPER_MODEL_SIZE = "medium"
+
 # إعداد Celery باستخدام Redis كـ broker و backend
 celery_app = Celery(
     "tasks",
@@ -32,95 +39,174 @@ celery_app.conf.update(
     enable_utc=True,
 )
 
-# دالة مساعدة لتقسيم النص إن لزم الأمر (يمكن استخدامه لاحقاً إذا احتجت لتقسيم النص)
-def split_text(text, max_length=4900):
-    import re
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    chunks = []
-    current = ""
-    for sentence in sentences:
-        if len(current) + len(sentence) + 1 > max_length:
-            if current:
-                chunks.append(current)
-            current = sentence
+# عدد اللغات التي تُترجم وتُولَّد بالتوازي في المهمة متعددة اللغات
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "3"))
+
+def _transcribe_video(filename, source_lang, translation_lang=None, plan=None):
+    """
+    الخطوة المشتركة: فك الصوت من الفيديو ونسخه مرة واحدة (مع الكاش)،
+    وإرجاع (result، النص، لغة المصدر، هل نحتاج للترجمة إلى translation_lang).
+    """
+    video_path = os.path.join(UPLOAD_FOLDER, filename)
+
+    # استخراج الصوت من الفيديو مباشرة إلى الذاكرة (بدون ملف WAV وسيط)
+    try:
+        audio = load_pcm(video_path)
+    except NoAudioStreamError:
+        raise Exception("Video has no audio")
+
+    result = {}
+    # تحديد لغة المصدر إن لم تُحدَّد (نوافذ أولى فقط) لمعرفة هل نحتاج للترجمة
+    digest = audio_hash(audio)
+    source_lang, needs_translation, decode_lang = resolve_language(audio, source_lang, translation_lang, digest)
+
+    # اختيار حجم النموذج حسب المدة والخطة والحمل، ثم النسخ باستخدام Whisper
+    model_size, decision = choose_model(duration_seconds(audio), plan, WHISPER_MODEL_SIZE)
+    result["model"] = model_size
+    result["model_decision"] = decision
+    with track_job():
+        transcription = cached_transcribe(audio, model_size, decode_lang, digest=digest)
+    transcript_text = transcription.get("text", "")
+    # بدون لغة مفروضة، اللغة التي اكتشفها نموذج النسخ هي المرجع لقرار الترجمة
+    if not decode_lang and transcription.get("language"):
+        source_lang = transcription["language"]
+        needs_translation = bool(translation_lang) and not same_language(source_lang, translation_lang)
+    result["source_language"] = source_lang
+    result["transcript"] = transcript_text
+    segment_store.save(
+        filename, transcription.get("segments", []), transcription.get("language"), model_size,
+        text_sha1=segment_store.text_digest(transcript_text)
+    )
+    return result, transcript_text, source_lang, needs_translation
+
+def _localize(filename, transcript_text, translation_lang, needs_translation, suffix="", profile=None):
+    """
+    خطوة لكل لغة: ترجمة النص الكامل، توليد الصوت، ثم دمجه مع الفيديو الأصلي.
+    suffix يميّز ملفات كل لغة في المهمة متعددة اللغات (فارغ للمهمة العادية).
+    profile: (الاسم، الإعدادات) من utils.encoding_profiles.
+    """
+    profile_name, settings = profile or encoding_profiles.resolve()
+    result = {}
+    # ترجمة النص الكامل عبر خدمة الترجمة الموحدة (مع ذاكرة الترجمة)
+    if not needs_translation:
+        # النص بلغة الهدف أصلًا، فلا حاجة لاستدعاء الترجمة
+        translated_text = transcript_text
+    else:
+        translated_text = translate_text(transcript_text, translation_lang)
+    result["translated"] = translated_text.strip()
+
+    audio_name = f"{filename}{suffix}_translated_audio.mp3"
+    video_name = f"{filename}{suffix}_final.mp4"
+    video_path = os.path.join(UPLOAD_FOLDER, filename)
+    video_output_path = os.path.join(OUTPUT_FOLDER, video_name)
+    # الصوت والفيديو يُولَّدان في مجلد عمل خاص بهذه الخطوة، ولا يُنقلان إلى
+    # AUDIO_FOLDER/OUTPUT_FOLDER إلا بعد اكتمالهما (نقل ذري)
+    # الفيديو يُنسخ مساره كما هو، فالناتج بحجم الأصل تقريبًا
+    expected_size = os.path.getsize(video_path) if os.path.exists(video_path) else 0
+    with Workspace("localize", expected_bytes=expected_size) as ws:
+        # توليد الصوت من النص المترجم باستخدام Google Text-to-Speech (مع كاش الصوت)
+        scratch_audio = ws.path(audio_name)
+        tts_cache.synthesize_to(scratch_audio, translated_text, translation_lang)
+
+        # توليد الفيديو النهائي: دمج الفيديو الأصلي مع الصوت المولّد.
+        # الفيديو نفسه لا يتغير، لذا ffmpeg ينسخ مساره كما هو ويرمّز الصوت الجديد فقط
+        scratch_video = ws.path(video_name, size_hint=expected_size)
+        started = time.perf_counter()
+        if ffmpeg_render.RENDER_BACKEND == "ffmpeg":
+            ffmpeg_render.replace_audio(video_path, scratch_audio, scratch_video, settings, workdir=ws.dir)
         else:
-            current += (" " + sentence) if current else sentence
-    if current:
-        chunks.append(current)
-    return chunks
+            import moviepy.editor as mp  # استيراد متأخر: لا يُحمَّل إلا عند الحاجة
+
+            # كل لغة تفتح نسختها من الفيديو لأن قارئ moviepy لا يُشارك بين threads
+            video = mp.VideoFileClip(video_path)
+            try:
+                final_video = video.set_audio(mp.AudioFileClip(scratch_audio))
+                final_video.write_videofile(
+                    scratch_video, codec="libx264", audio_codec="aac",
+                    temp_audiofile=ws.path("temp-audio.m4a"),
+                    **encoding_profiles.moviepy_kwargs(settings)
+                )
+            finally:
+                video.close()
+        ws.promote(scratch_audio, os.path.join(AUDIO_FOLDER, audio_name))
+        ws.promote(scratch_video, video_output_path)
+    # الصوت في AUDIO_FOLDER يُخدم عبر مسار /output/audio/ (serve_audio في app.py)
+    result["audio_url"] = f"/output/audio/{audio_name}"
+    # تسجيل ملف الترميز وزمن التصيير بجانب الناتج
+    encoding_profiles.write_sidecar(
+        video_output_path, profile_name, settings, time.perf_counter() - started,
+        backend=ffmpeg_render.RENDER_BACKEND, language=translation_lang
+    )
+    result["video_url"] = f"/output/{video_name}"
+    result["encoding_profile"] = profile_name
+    return result
 
-def process_full_ai(filename, source_lang, target_lang, translation_lang):
+def process_full_ai(filename, source_lang, target_lang, translation_lang, plan=None, encoding_profile=None):
     """
     تنفيذ العملية الكاملة: استخراج الصوت من الفيديو، نسخ النص باستخدام Whisper،
     ثم ترجمة النص الكامل (بدلاً من التلخيص) وتوليد الصوت والفيديو النهائي.
     """
-    result = {}
     try:
-        # تحديد مسارات الملفات
-        video_path = os.path.join(UPLOAD_FOLDER, filename)
-        audio_path = os.path.join(AUDIO_FOLDER, f"{filename}_audio.wav")
-        
-        # استخراج الصوت من الفيديو
-        video = mp.VideoFileClip(video_path)
-        if video.audio is None:
-            raise Exception("Video has no audio")
-        video.audio.write_audiofile(audio_path, logger=None)
-        
-        # استخراج النص الكامل عبر النسخ باستخدام Whisper
-        model = whisper.load_model("medium")
-        transcription = model.transcribe(audio_path, language=source_lang or None)
-        transcript_text = transcription.get("text", "")
-        result["transcript"] = transcript_text
-        
-        # حذف خطوة التلخيص، إذ سنستخدم النص الكامل للترجمة
-        translation_input = transcript_text
-        
-        # ترجمة النص الكامل باستخدام GoogleTranslator؛
-        # إذا تجاوز النص 4000 حرف، نقسمه إلى أجزاء
-        translator = GoogleTranslator(source="auto", target=translation_lang)
-        if len(translation_input) > 4000:
-            chunks = split_text(translation_input, 4000)
-            translated_text = ""
-            for chunk in chunks:
-                translated_text += translator.translate(chunk) + " "
-                time.sleep(1)
-        else:
-            translated_text = translator.translate(translation_input)
-        result["translated"] = translated_text.strip()
-        
-        # توليد الصوت من النص المترجم باستخدام Google Text-to-Speech
-        from google.cloud import texttospeech
-        tts_client = texttospeech.TextToSpeechClient()
-        synthesis_input = texttospeech.SynthesisInput(text=translated_text)
-        voice = texttospeech.VoiceSelectionParams(
-            language_code=translation_lang,
-            ssml_gender=texttospeech.SsmlVoiceGender.NEUTRAL
-        )
-        audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
-        tts_response = tts_client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
+        profile = encoding_profiles.resolve(encoding_profile, plan)
+        result, transcript_text, _, needs_translation = _transcribe_video(
+            filename, source_lang, translation_lang, plan
         )
-        audio_output_path = os.path.join(AUDIO_FOLDER, f"{filename}_translated_audio.mp3")
-        with open(audio_output_path, "wb") as out:
-            out.write(tts_response.audio_content)
-        result["audio_url"] = f"/output/{filename}_translated_audio.mp3"
-        
-        # توليد الفيديو النهائي: دمج الفيديو الأصلي مع الصوت المولّد
-        video_output_path = os.path.join(OUTPUT_FOLDER, f"{filename}_final.mp4")
-        # إعادة استخدام الفيديو الأصلي وربط الصوت المولّد به
-        final_video = video.set_audio(mp.AudioFileClip(audio_output_path))
-        final_video.write_videofile(video_output_path, codec="libx264", audio_codec="aac")
-        result["video_url"] = f"/output/{filename}_final.mp4"
-        
+        result.update(_localize(filename, transcript_text, translation_lang, needs_translation, profile=profile))
         return result, None
     except Exception as e:
         traceback.print_exc()
         return None, str(e)
 
+def _lang_suffix(lang):
+    """لاحقة أسماء ملفات كل لغة بصيغة آمنة (مثل _zh-CN)."""
+    return "_" + "".join(c for c in lang if c.isalnum() or c == "-")
+
+def process_multi_language(filename, source_lang, target_languages, plan=None, encoding_profile=None):
+    """
+    نسخ الفيديو مرة واحدة ثم ترجمة وتوليد الصوت والفيديو لكل لغة هدف بالتوازي.
+    فشل لغة لا يوقف البقية: يُسجَّل الخطأ تحت اللغة نفسها.
+    """
+    try:
+        profile = encoding_profiles.resolve(encoding_profile, plan)
+        result, transcript_text, source_lang, _ = _transcribe_video(filename, source_lang, None, plan)
+    except Exception as e:
+        traceback.print_exc()
+        return None, str(e)
+
+    def localize(lang):
+        needs_translation = not same_language(source_lang, lang)
+        return _localize(filename, transcript_text, lang, needs_translation, _lang_suffix(lang), profile)
+
+    result["languages"] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(FANOUT_WORKERS, len(target_languages)))) as pool:
+        futures = {lang: pool.submit(localize, lang) for lang in target_languages}
+        for lang, future in futures.items():
+            try:
+                result["languages"][lang] = future.result()
+            except Exception as e:
+                traceback.print_exc()
+                result["languages"][lang] = {"error": str(e)}
+
+    if all("error" in item for item in result["languages"].values()):
+        return None, "; ".join(f"{lang}: {item['error']}" for lang, item in result["languages"].items())
+    return result, None
+
 @celery_app.task(bind=True)
-def full_ai_process_task(self, filename, source_lang, target_lang, translation_lang):
+def full_ai_process_task(self, filename, source_lang, target_lang, translation_lang, plan=None,
+                         encoding_profile=None):
     """المهمة التي تنفذ العملية الكاملة في الخلفية"""
-    result, error = process_full_ai(filename, source_lang, target_lang, translation_lang)
+    result, error = process_full_ai(
+        filename, source_lang, target_lang, translation_lang, plan, encoding_profile
+    )
+    if error:
+        raise Exception(error)
+    return result
+
+@celery_app.task(bind=True)
+def multi_language_process_task(self, filename, source_lang, target_languages, plan=None,
+                                encoding_profile=None):
+    """المهمة متعددة اللغات: نسخ واحد، ثم ترجمة وصوت وفيديو لكل لغة"""
+    result, error = process_multi_language(filename, source_lang, target_languages, plan, encoding_profile)
     if error:
         raise Exception(error)
     return result
@@ -1,8 +1,14 @@
-from flask import Blueprint, request, jsonify, session, current_app
-import os, uuid, traceback, whisper, yt_dlp, re
+from flask import Blueprint, Response, request, jsonify, session, current_app, stream_with_context
+import json
+import os, uuid, traceback
+from collections import deque
 from werkzeug.utils import secure_filename
-from pydub import AudioSegment
-from deep_translator import GoogleTranslator
+from utils.long_form import iter_segments
+from utils import transcript_cache, segment_store, translation_coalescer
+from utils.translation import translate_text, is_supported_language
+from utils.audio_ingest import load_pcm, duration_seconds
+from utils.model_policy import choose_model, track_job
+from utils.language_id import detect_language, resolve_language, same_language
 
 transcribe_bp = Blueprint("transcribe", __name__)
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -22,77 +28,136 @@ def login_required(f):
     wrapped.__name__ = f.__name__
     return wrapped
 
-# دالة لتقسيم النص إلى أجزاء أصغر بحيث لا يتجاوز طول كل جزء الحد الأقصى (4900 حرف)
-def split_text(text, max_length=4900):
-    # محاولة التقسيم بناءً على نهاية الجمل (نقاط، علامتي تعجب أو استفهام)
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    chunks = []
-    current_chunk = ""
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) + 1 > max_length:
-            if current_chunk:
-                chunks.append(current_chunk)
-            current_chunk = sentence
-        else:
-            if current_chunk:
-                current_chunk += " " + sentence
-            else:
-                current_chunk = sentence
-    if current_chunk:
-        chunks.append(current_chunk)
-    return chunks
+# حجم نموذج Whisper المفضّل لهذه الأداة (قد تنزل السياسة لحجم أصغر تحت الحمل)
+WHISPER_MODEL_SIZE = "large"
 
-def process_transcription(input_path, source_lang, target_lang):
+def process_transcription(input_path, source_lang, target_lang, long_form=None, plan=None, latency_target=None,
+                          user_id=None):
+    # فك ترميز الملف مباشرة إلى PCM في الذاكرة (بدون ملف WAV وسيط)
     try:
-        model = whisper.load_model("large")  # ثابت
-    except Exception as e:
-        current_app.logger.error("Failed to load Whisper model: %s", e, exc_info=True)
-        return None, f"Failed to load model: {str(e)}", 500
-
-    # تحويل الملف إلى WAV إذا لزم الأمر
-    if not input_path.lower().endswith(".wav"):
-        try:
-            current_app.logger.debug("Converting file to WAV: %s", input_path)
-            audio = AudioSegment.from_file(input_path)
-            uid = os.path.splitext(os.path.basename(input_path))[0]
-            wav_path = os.path.join(UPLOAD_FOLDER, f"{uid}.wav")
-            audio.export(wav_path, format="wav")
+        current_app.logger.debug("Decoding audio: %s", input_path)
+        audio = load_pcm(input_path)
+    except Exception as conv_err:
+        current_app.logger.error("Error decoding media: %s", conv_err, exc_info=True)
+        return None, f"Error decoding media: {str(conv_err)}", 500
+    finally:
+        if os.path.exists(input_path):
             os.remove(input_path)
-            input_path = wav_path
-            current_app.logger.debug("Conversion complete, WAV file: %s", input_path)
-        except Exception as conv_err:
-            current_app.logger.error("Error converting to WAV: %s", conv_err, exc_info=True)
-            return None, f"Error converting media to WAV: {str(conv_err)}", 500
+
+    # بصمة الصوت تُحسب مرة واحدة وتُمرَّر لتحديد اللغة والكاش ومخزن المقاطع
+    digest = transcript_cache.audio_hash(audio)
+
+    # تحديد لغة المصدر مسبقًا إن لم تُحدَّد، وتخطي الترجمة إذا طابقت لغة الهدف
+    try:
+        source_lang, needs_translation, decode_lang = resolve_language(audio, source_lang, target_lang, digest)
+        current_app.logger.debug("Source language: %s (forced: %s)", source_lang, decode_lang)
+    except Exception as lid_err:
+        current_app.logger.error("Language detection error: %s", lid_err, exc_info=True)
+        needs_translation = bool(target_lang)
+        decode_lang = source_lang
+
+    # اختيار حجم النموذج حسب المدة والخطة والحمل الحالي
+    model_size, decision = choose_model(
+        duration_seconds(audio), plan, WHISPER_MODEL_SIZE, latency_target_s=latency_target
+    )
+    current_app.logger.debug("Model policy decision: %s", decision)
 
     # تنفيذ عملية النسخ (Transcription)
     try:
         current_app.logger.debug("Starting transcription on: %s", input_path)
-        result = model.transcribe(input_path, language=source_lang or None)
+        # الكاش أولًا، ثم النسخ (الملفات الطويلة تُقسَّم عند الصمت وتُنسخ بالتوازي)
+        with track_job():
+            result = transcript_cache.cached_transcribe(audio, model_size, decode_lang, long_form, digest=digest)
         transcript = result.get("text", "")
+        # بدون لغة مفروضة، اللغة التي اكتشفها نموذج النسخ هي المرجع لقرار الترجمة
+        if not decode_lang and result.get("language"):
+            source_lang = result["language"]
+            needs_translation = bool(target_lang) and not same_language(source_lang, target_lang)
         current_app.logger.debug("Transcription successful: %s", transcript)
     except Exception as trans_err:
         current_app.logger.error("Transcription error: %s", trans_err, exc_info=True)
         return None, f"Transcription failed: {str(trans_err)}", 500
 
-    # تنفيذ الترجمة إذا كانت مطلوبة، مع تقسيم النص ليتناسب مع الحد الأقصى (5000 حرف)
-    translated = ""
-    if target_lang:
+    # حفظ المقاطع بتوقيتها تحت بصمة الصوت لتستخدمها الأدوات الأخرى (البحث مثلًا)؛
+    # فشل الحفظ لا يُفشل النسخ نفسه
+    media_id = None
+    try:
+        media_id = f"audio-{digest[:16]}"
+        segment_store.save(
+            media_id, result.get("segments", []), result.get("language"), model_size, owner=user_id
+        )
+    except Exception as e:
+        current_app.logger.error("Error saving segments: %s", e, exc_info=True)
+
+    # تنفيذ الترجمة إذا كانت مطلوبة (الجمل المترجمة سابقًا تأتي من ذاكرة الترجمة)
+    translated = "" if needs_translation or not target_lang else transcript
+    if needs_translation:
         try:
-            chunks = split_text(transcript, 4900)  # تقسيم النص إلى أجزاء
-            current_app.logger.debug("Text split into %d chunks for translation.", len(chunks))
-            translator = GoogleTranslator(source="auto", target=target_lang)
-            translated_chunks = []
-            for i, chunk in enumerate(chunks):
-                current_app.logger.debug("Translating chunk %d: %s", i+1, chunk[:100] + "...")
-                translated_chunk = translator.translate(chunk)
-                translated_chunks.append(translated_chunk)
-            translated = " ".join(translated_chunks)
+            translated = translate_text(transcript, target_lang)
             current_app.logger.debug("Translation successful: %s", translated[:100] + "...")
         except Exception as translt_err:
             current_app.logger.error("Translation error: %s", translt_err, exc_info=True)
             return None, f"Translation failed: {str(translt_err)}", 500
 
-    return {"transcript": transcript.strip(), "translated": translated.strip() if translated else ""}, None, 200
+    return {
+        "transcript": transcript.strip(),
+        "translated": translated.strip() if translated else "",
+        "language": result.get("language") or source_lang,
+        "model": model_size,
+        "media_id": media_id,
+    }, None, 200
+
+# حفظ الملف المرفوع باسم فريد داخل مجلد الرفع
+def save_upload(file):
+    uid = uuid.uuid4().hex
+    original_filename = secure_filename(file.filename)
+    filename = f"{uid}_{original_filename}"
+    input_path = os.path.join(UPLOAD_FOLDER, filename)
+    try:
+        file.save(input_path)
+        current_app.logger.debug("File saved: %s", input_path)
+    except Exception as save_err:
+        current_app.logger.error("Error saving file: %s", save_err, exc_info=True)
+        return None, f"Error saving file: {str(save_err)}"
+    return input_path, None
+
+# تنزيل الصوت من رابط فيديو باستخدام yt-dlp
+def download_media(video_url):
+    import yt_dlp  # استيراد متأخر لتسريع إقلاع التطبيق
+
+    uid = uuid.uuid4().hex
+    try:
+        current_app.logger.debug("Attempting to download video from URL: %s", video_url)
+        ydl_opts = {
+            'outtmpl': os.path.join(UPLOAD_FOLDER, f"{uid}.%(ext)s"),
+            'quiet': True,
+            'no_warnings': True,
+            'format': 'bestaudio/best',
+            'retries': 10,
+            'socket_timeout': 30,
+            'user_agent': (
+                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                'AppleWebKit/537.36 (KHTML, like Gecko) '
+                'Chrome/98.0.4758.102 Safari/537.36'
+            )
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(video_url, download=True)
+            current_app.logger.debug("yt-dlp info: %s", info)
+            ext = info.get('ext', 'mp4')
+            filename = f"{uid}.{ext}"
+            input_path = os.path.join(UPLOAD_FOLDER, filename)
+            current_app.logger.debug("Video downloaded: %s", input_path)
+    except Exception as yt_err:
+        current_app.logger.error("Error downloading video: %s", yt_err, exc_info=True)
+        return None, f"Failed to download media using yt-dlp: {str(yt_err)}"
+    return input_path, None
+
+# قراءة خيار الوضع الطويل من النموذج: فارغ = تلقائي حسب المدة
+def parse_long_form(value):
+    if value is None or value == "":
+        return None
+    return value.lower() in ("1", "true", "yes", "on")
 
 # ---------------------------------------------------------------------
 # Endpoint لمعالجة رفع الملف فقط
@@ -106,21 +171,19 @@ def transcribe_file():
             current_app.logger.error("No file uploaded.")
             return jsonify({"error": "No file uploaded"}), 400
 
-        uid = uuid.uuid4().hex
-        original_filename = secure_filename(file.filename)
-        filename = f"{uid}_{original_filename}"
-        input_path = os.path.join(UPLOAD_FOLDER, filename)
-        try:
-            file.save(input_path)
-            current_app.logger.debug("File saved: %s", input_path)
-        except Exception as save_err:
-            current_app.logger.error("Error saving file: %s", save_err, exc_info=True)
-            return jsonify({"error": f"Error saving file: {str(save_err)}"}), 500
+        input_path, error_msg = save_upload(file)
+        if error_msg:
+            return jsonify({"error": error_msg}), 500
 
         source_lang = request.form.get("source_lang", "")
         target_lang = request.form.get("target_lang", "")
+        long_form = parse_long_form(request.form.get("long_form"))
+        latency_target = request.form.get("latency_target", type=float)
 
-        response, error_msg, status = process_transcription(input_path, source_lang, target_lang)
+        response, error_msg, status = process_transcription(
+            input_path, source_lang, target_lang, long_form, session.get("plan"), latency_target,
+            session.get("user_id")
+        )
         if error_msg:
             return jsonify({"error": error_msg}), status
         return jsonify(response), 200
@@ -141,37 +204,19 @@ def transcribe_url():
             current_app.logger.error("No valid URL provided.")
             return jsonify({"error": "No valid video URL provided."}), 400
 
-        uid = uuid.uuid4().hex
-        try:
-            current_app.logger.debug("Attempting to download video from URL: %s", video_url)
-            ydl_opts = {
-                'outtmpl': os.path.join(UPLOAD_FOLDER, f"{uid}.%(ext)s"),
-                'quiet': True,
-                'no_warnings': True,
-                'format': 'bestaudio/best',
-                'retries': 10,
-                'socket_timeout': 30,
-                'user_agent': (
-                    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                    'AppleWebKit/537.36 (KHTML, like Gecko) '
-                    'Chrome/98.0.4758.102 Safari/537.36'
-                )
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(video_url, download=True)
-                current_app.logger.debug("yt-dlp info: %s", info)
-                ext = info.get('ext', 'mp4')
-                filename = f"{uid}.{ext}"
-                input_path = os.path.join(UPLOAD_FOLDER, filename)
-                current_app.logger.debug("Video downloaded: %s", input_path)
-        except Exception as yt_err:
-            current_app.logger.error("Error downloading video: %s", yt_err, exc_info=True)
-            return jsonify({"error": f"Failed to download media using yt-dlp: {str(yt_err)}"}), 500
+        input_path, error_msg = download_media(video_url)
+        if error_msg:
+            return jsonify({"error": error_msg}), 500
 
         source_lang = request.form.get("source_lang", "")
         target_lang = request.form.get("target_lang", "")
+        long_form = parse_long_form(request.form.get("long_form"))
+        latency_target = request.form.get("latency_target", type=float)
 
-        response, error_msg, status = process_transcription(input_path, source_lang, target_lang)
+        response, error_msg, status = process_transcription(
+            input_path, source_lang, target_lang, long_form, session.get("plan"), latency_target,
+            session.get("user_id")
+        )
         if error_msg:
             return jsonify({"error": error_msg}), status
         return jsonify(response), 200
@@ -179,3 +224,173 @@ def transcribe_url():
         current_app.logger.error("Unexpected error in transcribe_url: %s", e, exc_info=True)
         traceback.print_exc()
         return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+# ---------------------------------------------------------------------
+# البث التدريجي: إرسال كل مقطع فور نسخه (SSE أو JSON lines)
+# نتائج البث (أجزاء قصيرة بلا سياق بينها) تُخزَّن في الكاش منفصلة عن النسخ الكامل
+STREAM_CACHE_MODE = "stream"
+
+def _format_event(event, data, fmt):
+    payload = json.dumps(data, ensure_ascii=False)
+    if fmt == "jsonl":
+        return json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+    return f"event: {event}\ndata: {payload}\n\n"
+
+def stream_transcription(input_path, source_lang, target_lang, fmt, plan=None, user_id=None):
+    def generate():
+        transcript, translated = [], []
+        # المقاطع بانتظار ترجمتها (بالترتيب)؛ الترجمة تجري عبر المجمِّع أثناء نسخ ما بعدها
+        pending = deque()
+
+        def flush(block=False):
+            while pending and (block or pending[0][1].done()):
+                seg, future = pending.popleft()
+                try:
+                    seg["translated"] = translation_coalescer.wait(future)
+                except Exception as translt_err:
+                    current_app.logger.error("Segment translation error: %s", translt_err, exc_info=True)
+                    seg["translated"] = ""
+                translated.append(seg["translated"])
+                yield _format_event("segment", seg, fmt)
+
+        try:
+            if target_lang and not is_supported_language(target_lang):
+                yield _format_event("error", {"error": f"Unsupported language '{target_lang}'"}, fmt)
+                return
+            audio = load_pcm(input_path)
+            model_size, _ = choose_model(duration_seconds(audio), plan, WHISPER_MODEL_SIZE)
+            yield _format_event("start", {
+                "duration": round(duration_seconds(audio), 2), "model": model_size,
+            }, fmt)
+
+            # عند وجود النص في الكاش (النسخ الكامل أولًا، ثم نتيجة بث سابقة) نرسل المقاطع المخزنة مباشرة
+            digest = transcript_cache.audio_hash(audio)
+            cached = transcript_cache.get(digest, model_size, source_lang)
+            if cached is None:
+                cached = transcript_cache.get(digest, model_size, source_lang, STREAM_CACHE_MODE)
+            if cached is not None:
+                segments = (
+                    {"id": i, "start": seg["start"], "end": seg["end"],
+                     "text": seg["text"].strip(), "language": cached.get("language")}
+                    for i, seg in enumerate(cached["segments"])
+                )
+            else:
+                segments = iter_segments(audio, model_size, source_lang)
+
+            collected = []
+            # النسخ يجري أثناء استهلاك المولّد، فيُحسب ضمن الحمل حتى آخر مقطع
+            with track_job():
+                for seg in segments:
+                    collected.append(seg)
+                    transcript.append(seg["text"])
+                    if not target_lang:
+                        yield _format_event("segment", seg, fmt)
+                        continue
+                    pending.append((seg, translation_coalescer.submit(seg["text"], target_lang)))
+                    yield from flush()
+            yield from flush(block=True)
+
+            if cached is None:
+                transcript_cache.put(digest, model_size, source_lang, {
+                    "text": " ".join(transcript),
+                    "segments": [
+                        {k: seg[k] for k in ("id", "start", "end", "text")}
+                        for seg in collected
+                    ],
+                    "language": collected[0]["language"] if collected else None,
+                }, STREAM_CACHE_MODE)
+            # حفظ المقاطع كما في النسخ العادي (للبحث والأدوات الأخرى)
+            media_id = None
+            try:
+                media_id = f"audio-{digest[:16]}"
+                segment_store.save(
+                    media_id, collected, collected[0]["language"] if collected else None, model_size,
+                    owner=user_id
+                )
+            except Exception as e:
+                current_app.logger.error("Error saving segments: %s", e, exc_info=True)
+            yield _format_event("done", {
+                "model": model_size,
+                "media_id": media_id,
+                "transcript": " ".join(transcript),
+                "translated": " ".join(t for t in translated if t),
+            }, fmt)
+        except Exception as e:
+            current_app.logger.error("Streaming transcription error: %s", e, exc_info=True)
+            yield _format_event("error", {"error": f"Transcription failed: {str(e)}"}, fmt)
+        finally:
+            if os.path.exists(input_path):
+                os.remove(input_path)
+
+    mimetype = "application/x-ndjson" if fmt == "jsonl" else "text/event-stream"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@transcribe_bp.route("/api/transcribe-file/stream", methods=["POST", "OPTIONS"])
+@login_required
+def transcribe_file_stream():
+    file = request.files.get("file")
+    if not file or not file.filename.strip():
+        return jsonify({"error": "No file uploaded"}), 400
+
+    input_path, error_msg = save_upload(file)
+    if error_msg:
+        return jsonify({"error": error_msg}), 500
+
+    return stream_transcription(
+        input_path,
+        request.form.get("source_lang", ""),
+        request.form.get("target_lang", ""),
+        request.args.get("format", "sse"),
+        session.get("plan"),
+        session.get("user_id"),
+    )
+
+@transcribe_bp.route("/api/transcribe-url/stream", methods=["POST", "OPTIONS"])
+@login_required
+def transcribe_url_stream():
+    video_url = request.form.get("video_url", "").strip()
+    if not video_url:
+        return jsonify({"error": "No valid video URL provided."}), 400
+
+    input_path, error_msg = download_media(video_url)
+    if error_msg:
+        return jsonify({"error": error_msg}), 500
+
+    return stream_transcription(
+        input_path,
+        request.form.get("source_lang", ""),
+        request.form.get("target_lang", ""),
+        request.args.get("format", "sse"),
+        session.get("plan"),
+        session.get("user_id"),
+    )
+
+# ---------------------------------------------------------------------
+# تحديد لغة الملف أو الرابط فقط (لتعبئة اللغات مسبقًا في الواجهة)
+@transcribe_bp.route("/api/detect-language", methods=["POST", "OPTIONS"])
+@login_required
+def detect_media_language():
+    file = request.files.get("file")
+    video_url = request.form.get("video_url", "").strip()
+    if file and file.filename.strip():
+        input_path, error_msg = save_upload(file)
+    elif video_url:
+        input_path, error_msg = download_media(video_url)
+    else:
+        return jsonify({"error": "Provide a file or a video URL."}), 400
+    if error_msg:
+        return jsonify({"error": error_msg}), 500
+
+    try:
+        audio = load_pcm(input_path)
+        return jsonify(detect_language(audio))
+    except Exception as e:
+        current_app.logger.error("Language detection error: %s", e, exc_info=True)
+        return jsonify({"error": f"Language detection failed: {str(e)}"}), 500
+    finally:
+        if os.path.exists(input_path):
+            os.remove(input_path)
@@ -1,11 +1,13 @@
 from flask import Blueprint, request, jsonify, send_from_directory, session
 import os
-import uuid
 import tempfile
-import whisper
-from deep_translator import GoogleTranslator
-from google.cloud import texttospeech
 from werkzeug.utils import secure_filename
+from utils.audio_ingest import load_pcm, duration_seconds
+from utils.model_policy import choose_model, track_job
+from utils.transcript_cache import cached_transcribe
+from utils import batch_scheduler
+from utils.language_id import same_language
+from utils import translation_coalescer, tts_cache
 
 # إنشاء Blueprint باسم transcribe_audio_bp
 transcribe_audio_bp = Blueprint("transcribe_audio", __name__)
@@ -17,8 +19,8 @@ OUTPUT_FOLDER = os.path.join(BASE_DIR, "output")
 os.makedirs(AUDIO_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-# تحميل نموذج Whisper مرة واحدة
-whisper_model = whisper.load_model("base")  # يمكنك تغييره إلى "medium" أو "large"
+# حجم نموذج Whisper المستخدم (يُحمَّل عند أول طلب عبر السجل المشترك)
+WHISPER_MODEL_SIZE = "base"  # الحجم المفضّل؛ قد تنزل سياسة الحمل لحجم أصغر
 
 # 🔐 التحقق من الجلسة
 def login_required(f):
@@ -53,25 +55,13 @@ def generate_audio():
         return jsonify({"error": "Text is empty"}), 400
 
     try:
-        client = texttospeech.TextToSpeechClient()
-        synthesis_input = texttospeech.SynthesisInput(text=text)
-        voice = texttospeech.VoiceSelectionParams(
-            language_code=lang_code,
-            ssml_gender=texttospeech.SsmlVoiceGender.NEUTRAL
-        )
-        audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
-        response = client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
-        )
-
-        output_filename = f"tts_{uuid.uuid4().hex}.mp3"
-        output_path = os.path.join(AUDIO_FOLDER, secure_filename(output_filename))
-        with open(output_path, "wb") as out:
-            out.write(response.audio_content)
+        # النص نفسه بنفس الصوت يُعاد من الكاش؛ والطويل يُولَّد على أجزاء متوازية
+        output_path, cached = tts_cache.cached_synthesize(text, lang_code)
 
         return jsonify({
             "message": "✅ Audio generated successfully with Google TTS.",
-            "audio_url": f"/output/audio/{output_filename}"
+            "audio_url": tts_cache.url_for(output_path),
+            "cached": cached
         })
 
     except Exception as google_err:
@@ -94,7 +84,14 @@ def transcribe_audio():
         audio_path = temp.name
 
     try:
-        result = whisper_model.transcribe(audio_path, language=source_lang if source_lang else None)
+        audio = load_pcm(audio_path)
+        model_size, _ = choose_model(duration_seconds(audio), session.get("plan"), WHISPER_MODEL_SIZE)
+        # المقاطع القصيرة المتزامنة تُجمع في دفعات عبر نموذج مشترك
+        with track_job():
+            result = cached_transcribe(
+                audio, model_size, source_lang or None,
+                transcribe_fn=batch_scheduler.transcribe, mode=batch_scheduler.CACHE_MODE
+            )
         transcript = result.get("text", "").strip()
     except Exception as e:
         os.remove(audio_path)
@@ -103,15 +100,20 @@ def transcribe_audio():
     os.remove(audio_path)
 
     translated_text = ""
-    if target_lang:
+    if target_lang and same_language(result.get("language"), target_lang):
+        translated_text = transcript
+    elif target_lang:
         try:
-            translated_text = GoogleTranslator(source="auto", target=target_lang).translate(transcript)
+            translated_text = translation_coalescer.translate(transcript, target_lang)
+        except ValueError as t_err:
+            return jsonify({"error": str(t_err)}), 400
         except Exception as t_err:
             return jsonify({"error": f"Translation failed: {str(t_err)}"}), 500
 
     return jsonify({
         "transcript": transcript,
-        "translated": translated_text
+        "translated": translated_text,
+        "model": model_size
     })
 
 
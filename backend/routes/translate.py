@@ -3,7 +3,7 @@ import os
 from flask import Blueprint, request, jsonify, session, current_app
 from flask_cors import cross_origin
 from werkzeug.utils import secure_filename
-from deep_translator import GoogleTranslator
+from utils import translation_coalescer, resilience
 
 translate_bp = Blueprint("translate", __name__)
 
@@ -52,9 +52,12 @@ def independent_translate():
         return jsonify({"error": "Language is required."}), 400
 
     try:
-        translator = GoogleTranslator(source="auto", target=language)
-        translated_text = translator.translate(text)
+        translated_text = translation_coalescer.translate(text, language)
         return jsonify({"translated": translated_text})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except (resilience.CircuitOpenError, resilience.DeadlineExceeded) as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         current_app.logger.error("Error translating text: %s", e, exc_info=True)
         return jsonify({"error": "Translation failed."}), 500
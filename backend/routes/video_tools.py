@@ -4,18 +4,17 @@ import datetime
 import sqlite3
 import uuid
 import traceback
-import moviepy.editor as mp
-import whisper
-from yt_dlp import YoutubeDL
 from flask import Blueprint, request, jsonify, session, current_app
 from werkzeug.utils import secure_filename
-from deep_translator import GoogleTranslator
 from flask_cors import cross_origin
-from moviepy.editor import TextClip  # تأكيد استيراد TextClip
 import urllib.parse
 
-# استيراد مهمة Celery من ملف tasks.py
-from routes.tasks import full_ai_process_task
+from utils.audio_ingest import load_pcm, duration_seconds, NoAudioStreamError
+from utils.model_policy import choose_model, track_job
+from utils import segment_store, resilience, tts_cache, ffmpeg_render, encoding_profiles
+from utils.workspace import Workspace
+from utils.transcript_cache import cached_transcribe
+from utils.translation import translate_text, translate_texts
 
 video_bp = Blueprint("video", __name__)
 
@@ -41,6 +40,8 @@ def login_required(f):
 @video_bp.route("/api/upload", methods=["POST"])
 @login_required
 def upload():
+    import moviepy.editor as mp  # استيراد متأخر لتسريع إقلاع التطبيق
+
     file = request.files.get("file")
     if not file:
         return jsonify({"error": "No file uploaded"}), 400
@@ -73,6 +74,9 @@ def upload():
 @video_bp.route("/api/download_url", methods=["POST"])
 @login_required
 def download_url():
+    import moviepy.editor as mp
+    from yt_dlp import YoutubeDL
+
     data = request.get_json()
     video_url = data.get("video_url")
     if not video_url:
@@ -117,20 +121,22 @@ def process_video():
         return jsonify({"error": "Filename required"}), 400
 
     video_path = os.path.join(UPLOAD_FOLDER, filename)
-    audio_path = os.path.join(AUDIO_FOLDER, f"{filename}_audio.wav")
 
+    # استخراج الصوت مباشرة من الفيديو إلى الذاكرة عبر ffmpeg
     try:
-        video = mp.VideoFileClip(video_path)
-        if video.audio is None:
-            return jsonify({"error": "No audio in video"}), 400
-        video.audio.write_audiofile(audio_path, logger=None)
+        audio = load_pcm(video_path)
+    except NoAudioStreamError:
+        return jsonify({"error": "No audio in video"}), 400
     except Exception as e:
         current_app.logger.error("Error processing video: %s", e, exc_info=True)
         return jsonify({"error": "Unable to process video"}), 400
 
+    # اختيار حجم النموذج حسب المدة والخطة والحمل الحالي
+    model_size, _ = choose_model(duration_seconds(audio), session.get("plan"), "medium")
+
     try:
-        model = whisper.load_model("medium", download_root="models/")
-        result = model.transcribe(audio_path)
+        with track_job():
+            result = cached_transcribe(audio, model_size)
         transcript = result.get("text", "")
     except Exception as e:
         current_app.logger.error("Error during transcription: %s", e, exc_info=True)
@@ -140,7 +146,17 @@ def process_video():
     with open(transcript_path, "w", encoding="utf-8") as f:
         f.write(transcript)
 
-    return jsonify({"message": "Transcription complete", "transcript": transcript})
+    # حفظ المقاطع بتوقيتها لتستخدمها الترجمة والترجمات المرئية والبحث
+    # (مع بصمة الملف النصي حتى نعرف لاحقًا إن عدّله المستخدم)
+    try:
+        segment_store.save(
+            filename, result.get("segments", []), result.get("language"), model_size,
+            owner=session.get("user_id"), text_sha1=segment_store.text_digest(transcript)
+        )
+    except Exception as e:
+        current_app.logger.error("Error saving segments: %s", e, exc_info=True)
+
+    return jsonify({"message": "Transcription complete", "transcript": transcript, "model": model_size})
 
 # ------------- (Optional) Summarize Endpoint (أداة مستقلة) -------------
 @video_bp.route("/api/summarize", methods=["POST"])
@@ -154,12 +170,16 @@ def summarize():
     transcript_path = os.path.join(OUTPUT_FOLDER, f"{filename}_transcript.txt")
     summary_path = os.path.join(OUTPUT_FOLDER, f"{filename}_summary.txt")
 
-    if not os.path.exists(transcript_path):
+    # المقاطع المخزنة فقط إذا لم يُعدَّل ملف النص بعد حفظها
+    segments = segment_store.open_for_text(filename, transcript_path)
+    if segments is not None:
+        text = segments.full_text()
+    elif os.path.exists(transcript_path):
+        with open(transcript_path, "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
         return jsonify({"error": "Transcript file not found"}), 404
 
-    with open(transcript_path, "r", encoding="utf-8") as f:
-        text = f.read()
-
     summary = " ".join(text.split()[:max(5, int(len(text.split()) * 0.2))])
     
     with open(summary_path, "w", encoding="utf-8") as f:
@@ -180,17 +200,24 @@ def translate():
     transcript_path = os.path.join(OUTPUT_FOLDER, f"{filename}_transcript.txt")
     output_path = os.path.join(OUTPUT_FOLDER, f"{filename}_translated.txt")
 
-    if not os.path.exists(transcript_path):
-        return jsonify({"error": "Transcript file not found"}), 404
+    # ترجمة المقاطع المخزنة سطرًا بسطر مع الإبقاء على توقيتها
+    # (إلا إذا عدّل المستخدم ملف النص، فنترجم الملف نفسه)
+    segments = segment_store.open_for_text(filename, transcript_path)
+    if segments is not None:
+        lines = translate_texts(segments.texts(), lang_code)
+        translated = "\n".join(line for line in lines if line)
+        segment_store.save_translation(
+            segment_store.translated_key(filename), segments, lines, lang_code,
+            owner=session.get("user_id"), text_sha1=segment_store.text_digest(translated.strip())
+        )
+    else:
+        if not os.path.exists(transcript_path):
+            return jsonify({"error": "Transcript file not found"}), 404
 
-    with open(transcript_path, "r", encoding="utf-8") as f:
-        text = f.read()
+        with open(transcript_path, "r", encoding="utf-8") as f:
+            text = f.read()
 
-    translated = ""
-    for i in range(0, len(text), 4000):
-        chunk = text[i:i+4000]
-        translated += GoogleTranslator(source="auto", target=lang_code).translate(chunk) + "\n"
-        time.sleep(1)
+        translated = translate_text(text, lang_code)
     
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(translated.strip())
@@ -217,37 +244,20 @@ def generate_audio():
         text = f.read()
 
     try:
-        from google.cloud import texttospeech
-        client = texttospeech.TextToSpeechClient()
-        synthesis_input = texttospeech.SynthesisInput(text=text)
-        voice = texttospeech.VoiceSelectionParams(
-            language_code=lang_code,
-            ssml_gender=texttospeech.SsmlVoiceGender.NEUTRAL
-        )
-        audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
-        response = client.synthesize_speech(input=synthesis_input, voice=voice, audio_config=audio_config)
-        with open(audio_output_path, "wb") as out:
-            out.write(response.audio_content)
+        tts_cache.synthesize_to(audio_output_path, text, lang_code)
+    except resilience.CircuitOpenError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         current_app.logger.error("Error in generating audio: %s", e, exc_info=True)
         return jsonify({"error": "Audio generation failed"}), 500
 
     return jsonify({"message": "Audio generated", "audio_url": f"/output/{filename}_translated_audio.mp3"})
 
-# ------------- Generate Video Endpoint -------------
-@video_bp.route("/api/generate-video", methods=["POST"])
-@login_required
-def generate_video():
-    data = request.get_json()
-    filename = data.get("filename")
-    if not filename:
-        return jsonify({"error": "Filename required"}), 400
-
-    # تعريف المسارات
-    video_path = os.path.join(UPLOAD_FOLDER, filename)
-    audio_path = os.path.join(AUDIO_FOLDER, f"{filename}_translated_audio.mp3")
-    translated_txt_path = os.path.join(OUTPUT_FOLDER, f"{filename}_translated.txt")
-    output_path = os.path.join(OUTPUT_FOLDER, f"{filename}_final.mp4")
+# المسار القديم (RENDER_BACKEND=moviepy): تركيب TextClip لكل سطر وتصيير الإطارات في Python.
+# يُرجع رد خطأ أو None عند النجاح. workdir: مجلد ملف الصوت المؤقت (مجلد عمل المهمة).
+def render_with_moviepy(video_path, audio_path, output_path, subtitles, watermark, profile=None, workdir=None):
+    import moviepy.editor as mp
+    from moviepy.editor import TextClip
 
     # قراءة ملف الفيديو الأصلي
     try:
@@ -256,7 +266,7 @@ def generate_video():
         current_app.logger.error("Error opening video file: %s", e, exc_info=True)
         return jsonify({"error": "Unable to open video file"}), 400
 
-    # قراءة ملف الصوت المُولَّد
+    # قراءة ملف الصوت المُولَّد
     try:
         audio = mp.AudioFileClip(audio_path)
     except Exception as e:
@@ -266,26 +276,8 @@ def generate_video():
     # دمج الصوت مع الفيديو
     video = video.set_audio(audio)
 
-    # قراءة نص الترجمة (إن وُجد)
-    subtitles_text = ""
-    if os.path.exists(translated_txt_path):
-        try:
-            with open(translated_txt_path, "r", encoding="utf-8") as f:
-                subtitles_text = f.read().strip()
-        except Exception as e:
-            current_app.logger.error("Error reading translated text: %s", e, exc_info=True)
-    else:
-        current_app.logger.warning("Translated text file not found.")
-
     subtitle_clips = None
-    if subtitles_text:
-        # تقسيم كل سطر للتعليق لمدة ثابتة (مثلاً 2 ثانية لكل سطر)
-        subtitles = [
-            ((i * 2, (i + 1) * 2), subtitle.strip())
-            for i, subtitle in enumerate(subtitles_text.split("\n"))
-            if subtitle.strip()
-        ]
-        current_app.logger.debug("Subtitles: %s", subtitles)
+    if subtitles:
         from moviepy.video.tools.subtitles import SubtitlesClip
         generator = lambda txt: TextClip(txt, font="Arial", fontsize=24, color="white")
         try:
@@ -294,7 +286,6 @@ def generate_video():
             current_app.logger.error("Error creating subtitles clip: %s", e, exc_info=True)
             subtitle_clips = None
 
-    
     # توليد الفيديو النهائي: دمج الفيديو (مع أو بدون ترجمات)
     try:
         elements = [video]
@@ -302,11 +293,11 @@ def generate_video():
         if subtitle_clips:
             elements.append(subtitle_clips.set_pos(("center", "bottom")))
 
-        if session.get("plan") == "free":
-            watermark = TextClip(
-                "ECHVID FREE VERSION", fontsize=40, color="white", font="Arial"
+        if watermark:
+            watermark_clip = TextClip(
+                watermark, fontsize=40, color="white", font="Arial"
             ).set_duration(video.duration).set_opacity(0.6).set_pos(("center", "top"))
-            elements.append(watermark)
+            elements.append(watermark_clip)
 
         if len(elements) > 1:
             composite = mp.CompositeVideoClip(elements)
@@ -317,8 +308,9 @@ def generate_video():
             output_path,
             codec="libx264",
             audio_codec="aac",
-            temp_audiofile="temp-audio.m4a",
-            remove_temp=True
+            temp_audiofile=os.path.join(workdir or os.path.dirname(output_path), "temp-audio.m4a"),
+            remove_temp=True,
+            **(encoding_profiles.moviepy_kwargs(profile) if profile else {})
         )
         composite.close()
         video.close()
@@ -326,14 +318,101 @@ def generate_video():
     except Exception as e:
         current_app.logger.error("Error generating final video: %s", e, exc_info=True)
         return jsonify({"error": "Video generation failed"}), 500
+    return None
+
+# ------------- Generate Video Endpoint -------------
+@video_bp.route("/api/generate-video", methods=["POST"])
+@login_required
+def generate_video():
+    data = request.get_json()
+    filename = data.get("filename")
+    if not filename:
+        return jsonify({"error": "Filename required"}), 400
+
+    # ملف الترميز: المطلوب في الطلب، وإلا الافتراضي لخطة المستخدم
+    try:
+        profile_name, profile = encoding_profiles.resolve(data.get("encoding_profile"), session.get("plan"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # تعريف المسارات
+    video_path = os.path.join(UPLOAD_FOLDER, filename)
+    audio_path = os.path.join(AUDIO_FOLDER, f"{filename}_translated_audio.mp3")
+    translated_txt_path = os.path.join(OUTPUT_FOLDER, f"{filename}_translated.txt")
+    output_path = os.path.join(OUTPUT_FOLDER, f"{filename}_final.mp4")
+
+    # قراءة نص الترجمة (إن وُجد)
+    subtitles_text = ""
+    if os.path.exists(translated_txt_path):
+        try:
+            with open(translated_txt_path, "r", encoding="utf-8") as f:
+                subtitles_text = f.read().strip()
+        except Exception as e:
+            current_app.logger.error("Error reading translated text: %s", e, exc_info=True)
+    else:
+        current_app.logger.warning("Translated text file not found.")
 
-    if not os.path.exists(output_path):
-        current_app.logger.error("Final video file not found at %s", output_path)
-        return jsonify({"error": "Final video file not created"}), 500
+    subtitles = []
+    # التوقيت المخزن فقط إذا لم يُعدَّل ملف الترجمة عبر /api/save-text (وإلا لا تطابق
+    # الترجمات المحروقة الصوتَ المولَّد من الملف المعدَّل)
+    translated_segments = segment_store.open_for_text(
+        segment_store.translated_key(filename), translated_txt_path
+    )
+    if translated_segments is not None:
+        # توقيت حقيقي من مقاطع Whisper المترجمة
+        subtitles = translated_segments.subtitles()
+    elif subtitles_text:
+        # تقسيم كل سطر للتعليق لمدة ثابتة (مثلاً 2 ثانية لكل سطر)
+        subtitles = [
+            ((i * 2, (i + 1) * 2), subtitle.strip())
+            for i, subtitle in enumerate(subtitles_text.split("\n"))
+            if subtitle.strip()
+        ]
+    current_app.logger.debug("Subtitles: %s", subtitles)
+    watermark = "ECHVID FREE VERSION" if session.get("plan") == "free" else None
+
+    # تصيير بتمريرة ffmpeg واحدة (ترجمات + علامة مائية + استبدال الصوت).
+    # كل الملفات الوسيطة والناتج قبل اعتماده في مجلد عمل خاص بهذا الطلب، ثم يُنقل
+    # الناتج ذريًا إلى OUTPUT_FOLDER (لا تتصادم طلبات متزامنة ولا يُقرأ ملف ناقص)
+    started = time.perf_counter()
+    # الناتج قد يقارب حجم الأصل مرتين (إعادة ترميز بجودة أعلى)
+    expected_size = 2 * os.path.getsize(video_path) if os.path.exists(video_path) else 0
+    with Workspace("render", expected_bytes=expected_size) as ws:
+        scratch_output = ws.path(f"{filename}_final.mp4", size_hint=expected_size)
+        if ffmpeg_render.RENDER_BACKEND == "ffmpeg":
+            if not os.path.exists(video_path):
+                return jsonify({"error": "Unable to open video file"}), 400
+            if not os.path.exists(audio_path):
+                return jsonify({"error": "Unable to open audio file"}), 400
+            try:
+                ffmpeg_render.render(
+                    video_path, scratch_output, audio_path, subtitles, watermark,
+                    profile=profile, workdir=ws.dir
+                )
+            except Exception as e:
+                current_app.logger.error("Error generating final video: %s", e, exc_info=True)
+                return jsonify({"error": "Video generation failed"}), 500
+        else:
+            error = render_with_moviepy(
+                video_path, audio_path, scratch_output, subtitles, watermark, profile, workdir=ws.dir
+            )
+            if error:
+                return error
+
+        if not os.path.exists(scratch_output):
+            current_app.logger.error("Final video file not found at %s", scratch_output)
+            return jsonify({"error": "Final video file not created"}), 500
+        ws.promote(scratch_output, output_path)
+
+    # تسجيل ملف الترميز وزمن التصيير بجانب الناتج
+    encoding_profiles.write_sidecar(
+        output_path, profile_name, profile, time.perf_counter() - started,
+        backend=ffmpeg_render.RENDER_BACKEND, subtitles=len(subtitles), watermark=bool(watermark)
+    )
 
     # ترميز اسم الملف للتأكد من أن الرابط صحيح
     final_file_url = f"/output/{urllib.parse.quote(filename + '_final.mp4')}"
-    return jsonify({"message": "Video generated", "video_url": final_file_url})
+    return jsonify({"message": "Video generated", "video_url": final_file_url, "encoding_profile": profile_name})
 
 # ------------- Endpoint لإطلاق العملية الشاملة (Full AI Process) -------------
 @video_bp.route("/api/full_process", methods=["POST"])
@@ -344,13 +423,76 @@ def full_process():
     source_lang = data.get("source_lang", "en")
     target_lang = data.get("target_lang", "en")
     language = data.get("language", "en")  # اللغة المستخدمة للترجمة
+    # قائمة لغات اختيارية: نسخ واحد ثم نسخة مترجمة لكل لغة (قائمة أو نص مفصول بفواصل)
+    target_languages = data.get("target_languages")
+    if isinstance(target_languages, str):
+        target_languages = target_languages.split(",")
 
     if not filename:
         return jsonify({"error": "Filename required"}), 400
 
-    task = full_ai_process_task.delay(filename, source_lang, target_lang, language)
+    # التحقق من ملف الترميز مبكرًا (يُطبَّق داخل المهمة)
+    encoding_profile = data.get("encoding_profile")
+    try:
+        encoding_profiles.resolve(encoding_profile, session.get("plan"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if target_languages:
+        target_languages = list(dict.fromkeys(l.strip() for l in target_languages if l and l.strip()))
+        if not target_languages:
+            return jsonify({"error": "target_languages is empty"}), 400
+
+        from routes.tasks import multi_language_process_task
+
+        task = multi_language_process_task.delay(
+            filename, source_lang, target_languages, session.get("plan"), encoding_profile
+        )
+        return jsonify({
+            "message": "Full process started", "task_id": task.id, "languages": target_languages
+        }), 202
+
+    # استيراد مهمة Celery من ملف tasks.py عند الحاجة فقط
+    from routes.tasks import full_ai_process_task
+
+    task = full_ai_process_task.delay(
+        filename, source_lang, target_lang, language, session.get("plan"), encoding_profile
+    )
     return jsonify({"message": "Full process started", "task_id": task.id}), 202
 
+# ------------- البحث داخل النص المنسوخ مع التوقيت -------------
+@video_bp.route("/api/segments/search", methods=["GET"])
+@login_required
+def search_segments():
+    media = request.args.get("media", "").strip()
+    query = request.args.get("q", "").strip()
+    if not media or not query:
+        return jsonify({"error": "media and q are required"}), 400
+
+    segments = segment_store.open_segments(media) if _owns_media(media, session.get("user_id")) else None
+    if segments is None:
+        return jsonify({"error": "No segments stored for this media"}), 404
+    return jsonify({"media": media, "results": segments.search(query)})
+
+def _owns_media(media, user_id):
+    """
+    مالك المقاطع: من سُجِّل عند الحفظ، أو صاحب الفيديو المرفوع بنفس الاسم
+    (مهام Celery تحفظ المقاطع بدون جلسة).
+    """
+    if segment_store.is_owner(media, user_id):
+        return True
+    suffix = segment_store.translated_key("")
+    filename = media[:-len(suffix)] if media.endswith(suffix) else media
+    try:
+        with sqlite3.connect(DB_FILE) as conn:
+            row = conn.execute(
+                "SELECT 1 FROM videos WHERE user_id = ? AND filename = ?", (user_id, filename)
+            ).fetchone()
+    except sqlite3.OperationalError:
+        # جدول videos يُنشأ بسكربت منفصل (init_videos_table.py)
+        return False
+    return row is not None
+
 # ------------- Endpoints لإدارة الفيديوهات -------------
 @video_bp.route("/api/videos", methods=["GET"])
 @login_required
@@ -0,0 +1,81 @@
+# backend/tests/test_ffmpeg_render.py
+"""
+- استبدال الصوت فقط (utils.ffmpeg_render.replace_audio) يجب أن ينسخ مسار الفيديو كما هو:
+  نولّد مقطعًا صغيرًا (testsrc + sine) ونقارن بصمة حزم الفيديو قبل وبعد.
+- مسار ملف الترجمات في أمر ffmpeg يجب أن يُهرَّب على مستويي الـ filtergraph
+  (لا يحتاج ffmpeg).
+
+التشغيل من مجلد backend (اختبارات التصيير تُتخطى إذا لم يكن ffmpeg/ffprobe مثبتًا):
+    python -m pytest -q tests/test_ffmpeg_render.py
+"""
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from utils import ffmpeg_render, encoding_profiles
+
+requires_ffmpeg = pytest.mark.skipif(
+    not (shutil.which(ffmpeg_render.FFMPEG_BINARY) and shutil.which(ffmpeg_render.FFPROBE_BINARY)),
+    reason="ffmpeg/ffprobe not installed",
+)
+
+
+def _ffmpeg(*args):
+    subprocess.run([ffmpeg_render.FFMPEG_BINARY, "-nostdin", "-y", "-v", "error", *args], check=True)
+
+
+def _unescape(value):
+    """فك تهريب مستوى واحد كما يفعل ffmpeg (av_get_token): \\x → x، و'...' حرفيًا."""
+    out, quoted, i = [], False, 0
+    while i < len(value):
+        char = value[i]
+        if char == "'":
+            quoted = not quoted
+        elif char == "\\" and not quoted:
+            i += 1
+            out.append(value[i])
+        else:
+            out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def test_subtitle_path_is_escaped_for_both_filtergraph_levels():
+    srt_path = r"C:\Temp\sub's, [1];final.srt"
+    cmd = ffmpeg_render.build_command("in.mp4", "out.mp4", srt_path=srt_path)
+    graph = cmd[cmd.index("-filter_complex") + 1]
+
+    escaped = graph.split("subtitles=filename=", 1)[1].split(":force_style=", 1)[0]
+    # لا فواصل غير مهرّبة تقطع السلسلة أو الخيارات
+    assert _unescape(_unescape(escaped)) == srt_path
+    assert escaped == r"C\\:\\\\Temp\\\\sub\\\'s\, \[1\]\;final.srt"
+
+
+@pytest.fixture
+def media(tmp_path):
+    video = str(tmp_path / "clip.mp4")
+    audio = str(tmp_path / "voice.mp3")
+    _ffmpeg(
+        "-f", "lavfi", "-i", "testsrc=duration=2:size=160x120:rate=25",
+        "-f", "lavfi", "-i", "sine=frequency=440:duration=2",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", video,
+    )
+    _ffmpeg("-f", "lavfi", "-i", "sine=frequency=880:duration=1.5", "-c:a", "libmp3lame", audio)
+    return video, audio
+
+
+@requires_ffmpeg
+def test_replace_audio_keeps_video_bit_identical(media, tmp_path):
+    video, audio = media
+    output = str(tmp_path / "final.mp4")
+    _, profile = encoding_profiles.resolve("standard")
+
+    ffmpeg_render.replace_audio(video, audio, output, profile)
+
+    assert os.path.exists(output)
+    assert ffmpeg_render.video_stream_hash(output) == ffmpeg_render.video_stream_hash(video)
+    # الصوت الأقصر يُكمَّل بصمت حتى نهاية الفيديو
+    assert ffmpeg_render.probe(output)["duration"] == pytest.approx(ffmpeg_render.probe(video)["duration"], abs=0.2)
+
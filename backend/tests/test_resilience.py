@@ -0,0 +1,146 @@
+# backend/tests/test_resilience.py
+"""
+اختبار طبقة الحماية (utils.resilience) ومنفّذ الترجمة (utils.translation_executor)
+أمام مزوّد HTTP محلي بتأخير وأخطاء مُحقنة بدل المزوّد الحقيقي.
+
+التشغيل من مجلد backend:
+    python -m pytest -q tests/test_resilience.py
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# ذاكرة الترجمة في مجلد مؤقت بدل data/ الخاص بالتطبيق (تُقرأ عند الاستيراد)
+os.environ.setdefault("TM_DB", os.path.join(tempfile.mkdtemp(), "translation_memory.db"))
+
+from utils import resilience, translation_executor
+from utils.translation import translate_units
+
+
+class FakeUpstream(ThreadingHTTPServer):
+    """مترجم وهمي: يعيد النص بأحرف كبيرة بعد delay ثانية، أو 500 عند fail=True."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.delay = 0.0
+        self.fail = False
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/translate"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        with server._lock:
+            server.hits += 1
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(server.delay)
+        if server.fail:
+            self.send_response(500)
+            self.end_headers()
+            return
+        payload = json.dumps({"lines": [line.upper() for line in body["lines"]]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = FakeUpstream()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def make_translator(server, upstream):
+    def fetch(batch):
+        request = urllib.request.Request(
+            server.url, data=json.dumps({"lines": batch}).encode(),
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())["lines"]
+
+    def translator(batch, target, source):
+        return upstream.call(fetch, batch)
+
+    return translator
+
+
+def test_translates_in_order(server):
+    upstream = resilience.Upstream("local", deadline=5, hedge_after=0, failures=5, reset_seconds=30)
+    units = [f"sentence {i}" for i in range(20)]
+    translated = translate_units(units, "xx", translator=make_translator(server, upstream))
+    assert translated == [u.upper() for u in units]
+
+
+def test_hedge_answers_before_slow_primary(server):
+    upstream = resilience.Upstream("local", deadline=5, hedge_after=0.2, failures=5, reset_seconds=30)
+    translator = make_translator(server, upstream)
+    server.delay = 1.0
+    threading.Timer(0.1, lambda: setattr(server, "delay", 0.0)).start()
+    started = time.monotonic()
+    assert translator(["a"], "xx", "auto") == ["A"]
+    assert time.monotonic() - started < 0.9
+    assert upstream.stats()["hedge_wins"] == 1
+
+
+def test_deadline_is_not_retried(server):
+    upstream = resilience.Upstream("local", deadline=0.3, hedge_after=0, failures=5, reset_seconds=30)
+    server.delay = 2.0
+    started = time.monotonic()
+    with pytest.raises(resilience.DeadlineExceeded):
+        translation_executor.map_ordered(
+            make_translator(server, upstream), [["a"]], "xx", "auto", retries=3, backoff=0.01
+        )
+    # مهلة واحدة فقط، لا (retries + 1) مهل
+    assert time.monotonic() - started < 1.0
+    assert server.hits == 1
+
+
+def test_breaker_opens_and_fails_fast(server):
+    upstream = resilience.Upstream("local", deadline=5, hedge_after=0, failures=3, reset_seconds=60)
+    translator = make_translator(server, upstream)
+    server.fail = True
+    for _ in range(3):
+        with pytest.raises(Exception):
+            translator(["a"], "xx", "auto")
+    assert upstream.breaker.state == "open"
+
+    hits = server.hits
+    with pytest.raises(resilience.CircuitOpenError):
+        translation_executor.map_ordered(translator, [["a"]], "xx", "auto", retries=3, backoff=0.01)
+    assert server.hits == hits
+
+
+def test_breaker_recovers_after_probe(server):
+    upstream = resilience.Upstream("local", deadline=5, hedge_after=0, failures=2, reset_seconds=0.2)
+    translator = make_translator(server, upstream)
+    server.fail = True
+    for _ in range(2):
+        with pytest.raises(Exception):
+            translator(["a"], "xx", "auto")
+    server.fail = False
+    time.sleep(0.25)
+    assert translator(["b"], "xx", "auto") == ["B"]
+    assert upstream.breaker.state == "closed"
@@ -0,0 +1,38 @@
+# backend/tests/test_segment_search.py
+"""
+البحث في المقاطع (/api/segments/search) متاح لمالكها فقط.
+
+التشغيل من مجلد backend (يُتخطى إذا لم تكن اعتماديات التطبيق مثبتة):
+    python -m pytest -q tests/test_segment_search.py
+"""
+import os
+import tempfile
+
+import pytest
+
+# المخازن في مجلد مؤقت بدل مجلدات التطبيق (تُقرأ عند الاستيراد)
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SEGMENT_STORE_DIR", os.path.join(_tmp, "segments"))
+os.environ.setdefault("TM_DB", os.path.join(_tmp, "translation_memory.db"))
+
+
+def _client(app_module, user_id):
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+    return client
+
+
+def test_search_is_limited_to_owner():
+    app_module = pytest.importorskip("app")
+    from utils import segment_store
+
+    segments = [{"start": 0.0, "end": 1.5, "text": "private meeting notes"}]
+    segment_store.save("audio-test-owner", segments, "en", "tiny", owner=1)
+    url = "/api/segments/search?media=audio-test-owner&q=meeting"
+
+    owner = _client(app_module, 1).get(url)
+    assert owner.status_code == 200
+    assert owner.get_json()["results"][0]["text"] == "private meeting notes"
+
+    assert _client(app_module, 2).get(url).status_code == 404
@@ -0,0 +1,59 @@
+# backend/tests/test_translation.py
+"""
+تقسيم الجمل (utils.text_chunker) وإعادة تركيب الترجمة (utils.translation)
+بمترجم وهمي بدل المزوّد الحقيقي.
+
+التشغيل من مجلد backend:
+    python -m pytest -q tests/test_translation.py
+"""
+import os
+import tempfile
+
+# ذاكرة الترجمة في مجلد مؤقت بدل data/ الخاص بالتطبيق
+os.environ.setdefault("TM_DB", os.path.join(tempfile.mkdtemp(), "translation_memory.db"))
+
+from utils import text_chunker, translation
+
+WORDS = {"你好。": "Hello.", "世界。": "World.", "你好吗？": "How are you?"}
+
+
+def fake_translator(batch, target, source):
+    return [WORDS.get(unit, unit.upper()) for unit in batch]
+
+
+def test_does_not_split_after_abbreviations():
+    sentences = [s for s, _ in text_chunker.split_sentences("Mr. Smith went home. Dr. J. Doe stayed, e.g. here.")]
+    assert sentences == ["Mr. Smith went home.", "Dr. J. Doe stayed, e.g. here."]
+
+
+def test_unspaced_source_is_rejoined_with_spaces():
+    text = "你好。世界。你好吗？"
+    assert translation.translate_text(text, "en", "zh-CN", fake_translator) == "Hello. World. How are you?"
+
+
+def test_spaces_are_dropped_for_unspaced_target():
+    def to_chinese(batch, target, source):
+        return [{"Hi.": "你好。", "Bye.": "再见。"}[unit] for unit in batch]
+
+    assert translation.translate_text("Hi. Bye.", "zh-CN", "en", to_chinese) == "你好。再见。"
+
+
+class MergingTranslator:
+    """مزوّد يدمج السطرين الأولين في أي دفعة أطول من سطرين (مثل ما يفعله المزوّد أحيانًا)."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def translate(self, text):
+        self.calls += 1
+        lines = [line.upper() for line in text.split("\n")]
+        if len(lines) > 2:
+            lines[:2] = [lines[0] + " " + lines[1]]
+        return "\n".join(lines)
+
+
+def test_line_mismatch_rebatches_instead_of_per_sentence():
+    translator = MergingTranslator()
+    batch = [f"line {i}" for i in range(8)]
+    assert translation._translate_lines(translator, batch) == [b.upper() for b in batch]
+    assert translator.calls < 1 + len(batch)
@@ -0,0 +1,28 @@
+# backend/tests/test_tts_cache.py
+"""
+روابط ملفات كاش TTS (tts_cache.url_for) يجب أن تُخدم فعلًا عبر التطبيق.
+
+التشغيل من مجلد backend (يُتخطى إذا لم تكن اعتماديات التطبيق مثبتة):
+    python -m pytest -q tests/test_tts_cache.py
+"""
+import os
+import tempfile
+
+import pytest
+
+# الكاش في مجلد مؤقت بدل مجلدات التطبيق (تُقرأ عند الاستيراد)
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("TTS_CACHE_DIR", os.path.join(_tmp, "tts-cache"))
+os.environ.setdefault("TTS_CACHE_DB", os.path.join(_tmp, "tts_cache.db"))
+os.environ.setdefault("TM_DB", os.path.join(_tmp, "translation_memory.db"))
+
+
+def test_cached_audio_url_is_served():
+    app_module = pytest.importorskip("app")
+    from utils import tts_cache
+
+    path = tts_cache.store("Hello there", "en-US", "NEUTRAL", "MP3", b"ID3fake-mp3-bytes")
+    response = app_module.app.test_client().get(tts_cache.url_for(path))
+
+    assert response.status_code == 200
+    assert response.data == b"ID3fake-mp3-bytes"
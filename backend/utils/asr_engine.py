@@ -0,0 +1,120 @@
+# backend/utils/asr_engine.py
+"""
+واجهة موحّدة لمحركات التعرف على الكلام (ASR) مع backend قابل للاختيار:
+- "whisper": مكتبة openai-whisper كما هي.
+- "whisper-int8": نفس النموذج بعد تكميم ديناميكي int8 لطبقات Linear (أسرع على CPU).
+
+يُختار الـ backend عبر ASR_BACKEND، وكل المسارات تمر عبر utils.whisper_registry.get_engine.
+"""
+import os
+from abc import ABC, abstractmethod
+
+ASR_BACKEND = os.getenv("ASR_BACKEND", "whisper")
+DOWNLOAD_ROOT = os.getenv("WHISPER_DOWNLOAD_ROOT") or None
+# توقيت الكلمات في المقاطع (يُخزَّن في utils.segment_store)؛ WHISPER_WORD_TIMESTAMPS=0 لتعطيله
+WORD_TIMESTAMPS = os.getenv("WHISPER_WORD_TIMESTAMPS", "1") != "0"
+
+
+class ASREngine(ABC):
+    """الواجهة التي تعتمد عليها المسارات: نسخ كامل، فك ترميز دفعة، وتحديد اللغة."""
+
+    backend = None
+
+    def __init__(self, size):
+        self.size = size
+        self.memory_mb = 0.0
+
+    @abstractmethod
+    def load(self):
+        """تحميل النموذج وضبط memory_mb، وإرجاع self."""
+
+    @abstractmethod
+    def transcribe(self, audio, language=None, **options):
+        """إرجاع {text, segments, language}."""
+
+    def decode_batch(self, clips, language=None):
+        """فك ترميز عدة مقاطع (≤ 30 ثانية) دفعة واحدة، وإرجاع [{text, language}]."""
+        return [
+            {"text": r["text"], "language": r["language"]}
+            for r in (self.transcribe(clip, language) for clip in clips)
+        ]
+
+    @abstractmethod
+    def detect_language(self, windows):
+        """احتمالات اللغات لكل نافذة صوت (30 ثانية): [{lang: p}]."""
+
+
+class WhisperEngine(ASREngine):
+    backend = "whisper"
+
+    def load(self):
+        import whisper
+
+        self.model = whisper.load_model(self.size, device="cpu", download_root=DOWNLOAD_ROOT)
+        self.memory_mb = sum(p.numel() * p.element_size() for p in self.model.parameters()) / (1024 * 1024)
+        return self
+
+    def transcribe(self, audio, language=None, **options):
+        options.setdefault("fp16", False)
+        options.setdefault("word_timestamps", WORD_TIMESTAMPS)
+        result = self.model.transcribe(audio, language=language or None, **options)
+        return {
+            "text": result.get("text", ""),
+            "segments": result.get("segments", []),
+            "language": result.get("language"),
+        }
+
+    def _mels(self, clips):
+        import torch
+        import whisper
+
+        return torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(clip.copy()), self.model.dims.n_mels)
+            for clip in clips
+        ]).to(self.model.device)
+
+    def decode_batch(self, clips, language=None):
+        import whisper
+
+        options = whisper.DecodingOptions(language=language or None, fp16=False)
+        results = whisper.decode(self.model, self._mels(clips), options)
+        return [{"text": r.text, "language": r.language} for r in results]
+
+    def detect_language(self, windows):
+        _, probs = self.model.detect_language(self._mels(windows))
+        return probs
+
+
+class QuantizedWhisperEngine(WhisperEngine):
+    """Whisper مع تكميم ديناميكي int8 لكل طبقات Linear (CPU فقط)."""
+
+    backend = "whisper-int8"
+
+    def load(self):
+        import torch
+        import whisper
+
+        model = whisper.load_model(self.size, device="cpu", download_root=DOWNLOAD_ROOT)
+        linear_bytes, other_bytes = 0, 0
+        for module in model.modules():
+            # whisper يعرّف Linear خاصًا به؛ نعيده إلى nn.Linear حتى يتعرف عليه التكميم
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+                linear_bytes += module.weight.numel()  # بايت واحد لكل وزن بعد التكميم
+        self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        other_bytes = sum(p.numel() * p.element_size() for p in self.model.parameters())
+        self.memory_mb = (linear_bytes + other_bytes) / (1024 * 1024)
+        return self
+
+
+BACKENDS = {
+    WhisperEngine.backend: WhisperEngine,
+    QuantizedWhisperEngine.backend: QuantizedWhisperEngine,
+}
+
+
+def create_engine(size, backend=None):
+    backend = backend or ASR_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ASR backend '{backend}'. Available: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](size).load()
@@ -0,0 +1,90 @@
+# backend/utils/audio_ingest.py
+"""
+مسار موحّد لإدخال الصوت: تمرير أي حاوية (فيديو أو صوت) عبر ffmpeg مباشرة
+إلى مصفوفة NumPy بصيغة float32 أحادية القناة بتردد 16 kHz، دون ملفات WAV وسيطة.
+المصفوفات المفكوكة تُحفظ في كاش LRU داخل الذاكرة مفتاحه بصمة محتوى الملف، فيُعاد
+استخدامها حتى لو رُفع نفس الملف مرة أخرى باسم مؤقت مختلف (الملفات المرفوعة تُحذف بعد الفك).
+"""
+import os
+import hashlib
+import subprocess
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+# الحجم الأقصى لكاش المصفوفات المفكوكة بالميغابايت (0 = تعطيل)
+CACHE_MAX_MB = float(os.getenv("AUDIO_CACHE_MAX_MB", "256"))
+
+_lock = threading.Lock()
+_cache = OrderedDict()   # (sha256 الملف, sr) -> np.ndarray
+_cache_bytes = 0
+
+
+class NoAudioStreamError(ValueError):
+    """الملف لا يحتوي على مسار صوتي."""
+
+
+def _cache_key(path):
+    """بصمة محتوى الملف (قراءته أرخص بكثير من فك ترميزه عبر ffmpeg)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return (digest.hexdigest(),)
+
+
+def _cache_put(key, audio):
+    global _cache_bytes
+    if audio.nbytes > CACHE_MAX_MB * 1024 * 1024:
+        return
+    with _lock:
+        _cache[key] = audio
+        _cache_bytes += audio.nbytes
+        while _cache_bytes > CACHE_MAX_MB * 1024 * 1024:
+            _, old = _cache.popitem(last=False)
+            _cache_bytes -= old.nbytes
+
+
+def decode(path, sr=SAMPLE_RATE):
+    """فك ترميز أول مسار صوتي في الملف مباشرة إلى float32 أحادي القناة."""
+    cmd = [
+        FFMPEG_BINARY, "-nostdin", "-threads", "0", "-i", path,
+        "-map", "0:a:0", "-vn", "-f", "f32le", "-ac", "1", "-ar", str(sr), "-",
+    ]
+    proc = subprocess.run(cmd, capture_output=True)
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode("utf-8", "ignore")
+        if "matches no streams" in stderr or "does not contain any stream" in stderr:
+            raise NoAudioStreamError(f"No audio stream in {os.path.basename(path)}")
+        raise RuntimeError(f"ffmpeg failed to decode audio: {stderr.strip()[-500:]}")
+    return np.frombuffer(proc.stdout, np.float32)
+
+
+def load_pcm(path, sr=SAMPLE_RATE):
+    """
+    إرجاع الصوت كمصفوفة float32 (للقراءة فقط) مع إعادة استخدام النسخة المفكوكة
+    سابقًا لملف بنفس المحتوى.
+    """
+    if CACHE_MAX_MB <= 0:
+        audio = decode(path, sr)
+        audio.flags.writeable = False
+        return audio
+
+    key = _cache_key(path) + (sr,)
+    with _lock:
+        audio = _cache.get(key)
+        if audio is not None:
+            _cache.move_to_end(key)
+            return audio
+
+    audio = decode(path, sr)
+    audio.flags.writeable = False
+    _cache_put(key, audio)
+    return audio
+
+
+def duration_seconds(audio, sr=SAMPLE_RATE):
+    return len(audio) / sr
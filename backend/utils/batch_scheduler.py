@@ -0,0 +1,157 @@
+# backend/utils/batch_scheduler.py
+"""
+جدولة استدلال مُجمَّعة (micro-batching) للمقاطع القصيرة:
+تُجمع نوافذ mel-spectrogram القادمة من طلبات متزامنة خلال نافذة زمنية صغيرة،
+وتمرّ دفعة واحدة عبر محرك ASR مشترك، ثم تُعاد كل نتيجة إلى صاحبها عبر Future.
+
+التجميع يتم داخل العملية الواحدة، لذا يستفيد منه تشغيل gunicorn بعدة threads
+لكل worker (مثلًا: gunicorn --threads 8).
+"""
+import os
+import time
+import queue
+import threading
+import logging
+from concurrent.futures import Future, InvalidStateError, TimeoutError
+
+from utils.whisper_registry import get_engine
+
+SAMPLE_RATE = 16000
+# أقصى طول لمقطع يدخل الدفعة = نافذة Whisper واحدة (30 ثانية)
+MAX_CLIP_SECONDS = 30
+MAX_BATCH = int(os.getenv("WHISPER_MAX_BATCH", "8"))
+MAX_WAIT_MS = float(os.getenv("WHISPER_BATCH_WAIT_MS", "40"))
+# أقصى انتظار لنتيجة مقطع واحد؛ لا ينتظر الطلب للأبد إذا تعطلت الدفعة
+RESULT_TIMEOUT_SECONDS = float(os.getenv("WHISPER_BATCH_TIMEOUT_SECONDS", "120"))
+# نتائج الدفعات (مقطع واحد بلا كلمات ولا temperature fallback) تُخزَّن في كاش النسخ
+# بمساحة مفاتيح منفصلة عن النسخ الكامل
+CACHE_MODE = "batch"
+
+logger = logging.getLogger(__name__)
+
+
+def _fail(items, error):
+    """إنهاء كل Future لم يُحسم بعد بالخطأ؛ لا يرفع أي استثناء أبدًا."""
+    for item in items:
+        future = item[-1]
+        try:
+            if not future.done():
+                future.set_exception(error)
+        except InvalidStateError:
+            pass
+
+
+class BatchScheduler:
+    def __init__(self, model_size, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.model_size = model_size
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stats = {"requests": 0, "batches": 0, "max_batch_seen": 0}
+        self._thread = threading.Thread(target=self._run, name=f"whisper-batch-{model_size}", daemon=True)
+        self._thread.start()
+
+    def submit(self, audio, language=None):
+        """إضافة مقطع (≤ 30 ثانية) إلى قائمة الانتظار وإرجاع Future بنتيجته."""
+        future = Future()
+        self._queue.put((audio, language or None, future))
+        return future
+
+    def transcribe(self, audio, language=None, timeout=RESULT_TIMEOUT_SECONDS):
+        future = self.submit(audio, language)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # لا حاجة لفك ترميزه إن لم يبدأ بعد
+            future.cancel()
+            raise
+
+    def _collect(self):
+        """انتظار أول طلب ثم جمع ما يصل خلال max_wait حتى max_batch."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                # الطلبات التي انتهت مهلتها وأُلغيت تُستبعد، والباقي يُعلَّم "قيد التشغيل"
+                # فلا يستطيع المستدعي إلغاءه بعد الآن (لا سباق بين cancel و set_result)
+                batch = [item for item in self._collect() if item[2].set_running_or_notify_cancel()]
+                # خيارات فك الترميز مشتركة داخل الدفعة، لذا نجمع حسب اللغة
+                groups = {}
+                for item in batch:
+                    groups.setdefault(item[1], []).append(item)
+                for language, items in groups.items():
+                    self._decode(language, items)
+            except Exception as e:
+                # أي خطأ غير متوقع لا يوقف thread الجدولة ولا يترك طلبات معلقة
+                logger.exception("Batch scheduler error (%s)", self.model_size)
+                try:
+                    _fail(batch, e)
+                except Exception:
+                    pass
+
+    def _decode(self, language, items):
+        try:
+            engine = get_engine(self.model_size)
+            results = engine.decode_batch([audio for audio, _, _ in items], language)
+            if len(results) != len(items):
+                raise RuntimeError(f"decode_batch returned {len(results)} results for {len(items)} clips")
+
+            self._stats["requests"] += len(items)
+            self._stats["batches"] += 1
+            self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], len(items))
+            for (audio, _, future), res in zip(items, results):
+                text = res["text"].strip()
+                duration = round(len(audio) / SAMPLE_RATE, 3)
+                future.set_result({
+                    "text": text,
+                    "segments": [{"id": 0, "start": 0.0, "end": duration, "text": text}] if text else [],
+                    "language": res["language"],
+                })
+        except Exception as e:
+            _fail(items, e)
+
+    def stats(self):
+        data = dict(self._stats)
+        data["model"] = self.model_size
+        data["pending"] = self._queue.qsize()
+        data["avg_batch"] = round(data["requests"] / data["batches"], 2) if data["batches"] else 0.0
+        return data
+
+
+_lock = threading.Lock()
+_schedulers = {}
+
+
+def get_scheduler(model_size):
+    with _lock:
+        if model_size not in _schedulers:
+            _schedulers[model_size] = BatchScheduler(model_size)
+        return _schedulers[model_size]
+
+
+def transcribe(audio, model_size, language=None, long_form=None):
+    """
+    نفس واجهة utils.long_form.transcribe: المقاطع القصيرة تمر عبر الدفعات المشتركة،
+    والأطول من نافذة واحدة تعود إلى المسار العادي.
+    """
+    if long_form or len(audio) > MAX_CLIP_SECONDS * SAMPLE_RATE:
+        from utils.long_form import transcribe as transcribe_single
+        return transcribe_single(audio, model_size, language, long_form)
+    return get_scheduler(model_size).transcribe(audio, language)
+
+
+def stats():
+    with _lock:
+        return [s.stats() for s in _schedulers.values()]
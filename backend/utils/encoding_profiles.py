@@ -0,0 +1,72 @@
+# backend/utils/encoding_profiles.py
+"""
+ملفات ترميز مسمّاة للفيديو النهائي (preset وCRF وعدد threads ومعدل الصوت):
+- fast-preview: سريع بجودة أقل (الافتراضي للخطة المجانية).
+- standard: التوازن المعتاد (الافتراضي للخطة المدفوعة).
+- archival: أبطأ بجودة أعلى.
+تُختار لكل طلب أو حسب الخطة، ويُسجَّل المستخدم منها بجانب الناتج (ملف JSON).
+"""
+import os
+import json
+import time
+import uuid
+
+# 0 = يختار ffmpeg/x264 العدد تلقائيًا حسب الأنوية
+THREADS = int(os.getenv("ENCODE_THREADS", "0"))
+
+PROFILES = {
+    "fast-preview": {"preset": "veryfast", "crf": 28, "threads": THREADS, "audio_bitrate": "96k"},
+    "standard": {"preset": "medium", "crf": 23, "threads": THREADS, "audio_bitrate": "128k"},
+    "archival": {"preset": "slow", "crf": 18, "threads": THREADS, "audio_bitrate": "192k"},
+}
+PLAN_DEFAULTS = {
+    "free": os.getenv("ENCODE_PROFILE_FREE", "fast-preview"),
+    "premium": os.getenv("ENCODE_PROFILE_PREMIUM", "standard"),
+}
+DEFAULT_PROFILE = os.getenv("ENCODE_PROFILE_DEFAULT", "standard")
+
+
+def resolve(name=None, plan=None):
+    """
+    إرجاع (الاسم، الإعدادات): المطلوب صراحةً، وإلا الافتراضي للخطة.
+    يرفع ValueError لاسم غير معروف.
+    """
+    name = (name or "").strip().lower() or PLAN_DEFAULTS.get(plan, DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoding profile '{name}'. Available: {', '.join(PROFILES)}")
+    return name, dict(PROFILES[name])
+
+
+def ffmpeg_video_args(profile):
+    return ["-preset", profile["preset"], "-crf", str(profile["crf"]), "-threads", str(profile["threads"])]
+
+
+def ffmpeg_audio_args(profile):
+    return ["-b:a", profile["audio_bitrate"]]
+
+
+def moviepy_kwargs(profile):
+    """نفس الإعدادات بصيغة معاملات write_videofile في moviepy."""
+    return {
+        "preset": profile["preset"],
+        "threads": profile["threads"] or None,
+        "audio_bitrate": profile["audio_bitrate"],
+        "ffmpeg_params": ["-crf", str(profile["crf"])],
+    }
+
+
+def write_sidecar(output_path, name, profile, seconds, **extra):
+    """حفظ إعدادات الترميز وزمن التصيير بجانب الناتج ({output}.json) للمقارنة لاحقًا."""
+    record = {
+        "profile": name,
+        "settings": profile,
+        "render_seconds": round(seconds, 2),
+        "size_bytes": os.path.getsize(output_path) if os.path.exists(output_path) else None,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    record.update(extra)
+    tmp_path = f"{output_path}.json.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output_path + ".json")
+    return record
@@ -0,0 +1,172 @@
+# backend/utils/ffmpeg_render.py
+"""
+تصيير الفيديو النهائي بتمريرة ترميز واحدة عبر ffmpeg بدل تركيب moviepy إطارًا بإطار:
+- الترجمات تُحرق عبر فلتر subtitles (libass) من ملف SRT مؤقت.
+- العلامة المائية عبر drawtext (نفس النص والموضع والشفافية).
+- استبدال الصوت داخل نفس الأمر (الصوت الأقصر يُكمَّل بصمت حتى نهاية الفيديو كما في moviepy).
+- إذا لم يكن هناك ترجمات ولا علامة مائية فالفيديو لم يتغير: يُنسخ كما هو (-c:v copy)
+  ويُرمَّز الصوت الجديد فقط.
+
+RENDER_BACKEND=ffmpeg (الافتراضي) أو moviepy للرجوع للمسار القديم.
+"""
+import os
+import re
+import json
+import tempfile
+import subprocess
+
+from utils import encoding_profiles
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "ffmpeg").lower()
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+FONT = os.getenv("RENDER_FONT", "Arial")
+# ارتفاع المرجع في libass (PlayResY الافتراضي لملفات SRT)
+_ASS_PLAY_RES_Y = 288
+
+
+def probe(path):
+    """إرجاع {width, height, duration, fps} لأول مسار فيديو."""
+    cmd = [
+        FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,r_frame_rate:format=duration",
+        "-of", "json", path,
+    ]
+    info = json.loads(subprocess.run(cmd, capture_output=True, check=True).stdout)
+    stream = info["streams"][0]
+    num, _, den = stream.get("r_frame_rate", "0/1").partition("/")
+    return {
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "duration": float(info["format"].get("duration", 0)),
+        "fps": float(num) / float(den or 1) if float(den or 1) else 0.0,
+    }
+
+
+def _srt_time(seconds):
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def write_srt(subtitles, path):
+    """كتابة [((start, end), text)] (صيغة SubtitlesClip) إلى ملف SRT."""
+    with open(path, "w", encoding="utf-8") as f:
+        for i, ((start, end), text) in enumerate(subtitles, 1):
+            f.write(f"{i}\n{_srt_time(start)} --> {_srt_time(end)}\n{text.strip()}\n\n")
+
+
+def _quote(value):
+    """
+    تهريب قيمة خيار داخل filtergraph على المستويين اللذين يحللهما ffmpeg:
+    أولًا قيمة الخيار داخل المرشح (\\ و ' و :)، ثم الـ filtergraph نفسه
+    (\\ و ' و [ ] , ;). هكذا تصل مسارات مثل C:\\Temp\\sub's.srt كما هي.
+    """
+    value = re.sub(r"([\\':])", r"\\\1", value)
+    return re.sub(r"([\\'\[\],;])", r"\\\1", value)
+
+
+def build_command(video_path, output_path, audio_path=None, srt_path=None, watermark=None,
+                  height=None, fontsize=24, watermark_fontsize=40, extra_args=(),
+                  duration=None, copy_video=True, profile=None):
+    """
+    بناء أمر ffmpeg واحد: فلاتر الفيديو + الصوت + الترميز.
+    بدون فلاتر فيديو يُنسخ مسار الفيديو (إلا إذا copy_video=False)، وتحدد duration
+    طول الناتج بدل -shortest لأن النسخ لا يمر عبر مرشحات.
+    profile: إعدادات من utils.encoding_profiles (preset/CRF/threads/معدل الصوت).
+    """
+    filters = []
+    if srt_path:
+        # حجم الخط في libass نسبي لارتفاع 288؛ نحوّله ليطابق البكسلات في moviepy
+        size = round(fontsize * _ASS_PLAY_RES_Y / height) if height else fontsize
+        style = f"FontName={FONT},FontSize={size},PrimaryColour=&H00FFFFFF,Alignment=2,MarginV=0"
+        filters.append(f"subtitles=filename={_quote(srt_path)}:force_style={_quote(style)}")
+    if watermark:
+        filters.append(
+            f"drawtext=text={_quote(watermark)}:font={_quote(FONT)}:fontsize={watermark_fontsize}"
+            ":fontcolor=white@0.6:x=(w-text_w)/2:y=0"
+        )
+
+    cmd = [FFMPEG_BINARY, "-nostdin", "-y", "-i", video_path]
+    if audio_path:
+        cmd += ["-i", audio_path]
+    graph = []
+    if filters:
+        graph.append(f"[0:v]{','.join(filters)}[v]")
+    if audio_path:
+        graph.append("[1:a]apad[a]")
+    if graph:
+        cmd += ["-filter_complex", ";".join(graph)]
+    cmd += ["-map", "[v]" if filters else "0:v:0"]
+    if audio_path:
+        cmd += ["-map", "[a]"]
+        # apad يطيل الصوت بلا نهاية، ونوقفه عند نهاية الفيديو
+        cmd += ["-t", f"{duration:.3f}"] if duration else ["-shortest"]
+    else:
+        cmd += ["-map", "0:a?"]
+    if copy_video and not filters:
+        cmd += ["-c:v", "copy"]
+    else:
+        cmd += ["-c:v", "libx264"]
+        if profile:
+            cmd += encoding_profiles.ffmpeg_video_args(profile)
+    cmd += ["-c:a", "aac"]
+    if profile:
+        cmd += encoding_profiles.ffmpeg_audio_args(profile)
+    cmd += ["-movflags", "+faststart", *extra_args, output_path]
+    return cmd
+
+
+def _run(cmd):
+    proc = subprocess.run(cmd, capture_output=True)
+    if proc.returncode != 0:
+        tail = proc.stderr.decode("utf-8", "replace").strip().splitlines()[-5:]
+        raise RuntimeError("ffmpeg render failed: " + " | ".join(tail))
+
+
+def render(video_path, output_path, audio_path=None, subtitles=None, watermark=None,
+           fontsize=24, watermark_fontsize=40, extra_args=(), profile=None, workdir=None):
+    """
+    تصيير الفيديو النهائي بتمريرة واحدة. subtitles بصيغة [((start, end), text)].
+    workdir: مجلد الملفات الوسيطة (SRT)، عادةً مجلد عمل المهمة من utils.workspace.
+    يرفع RuntimeError مع آخر أسطر stderr عند فشل ffmpeg.
+    """
+    srt_path = None
+    try:
+        info = probe(video_path)
+        if subtitles:
+            fd, srt_path = tempfile.mkstemp(suffix=".srt", dir=workdir)
+            os.close(fd)
+            write_srt(subtitles, srt_path)
+        args = (
+            video_path, output_path, audio_path, srt_path, watermark,
+            info["height"], fontsize, watermark_fontsize, extra_args, info["duration"]
+        )
+        try:
+            _run(build_command(*args, profile=profile))
+        except RuntimeError:
+            if srt_path or watermark:
+                raise
+            # بعض الترميزات لا تُنسخ إلى حاوية MP4 كما هي؛ نعيد الترميز في هذه الحالة
+            _run(build_command(*args, copy_video=False, profile=profile))
+    finally:
+        if srt_path and os.path.exists(srt_path):
+            os.remove(srt_path)
+    return output_path
+
+
+def replace_audio(video_path, audio_path, output_path, profile=None, workdir=None):
+    """استبدال صوت الفيديو فقط: نسخ مسار الفيديو كما هو وترميز الصوت الجديد."""
+    return render(video_path, output_path, audio_path, profile=profile, workdir=workdir)
+
+
+def video_stream_hash(path):
+    """بصمة sha256 لحزم مسار الفيديو الأول (للتحقق من أن النسخ لم يغيّر الفيديو)."""
+    cmd = [
+        FFMPEG_BINARY, "-nostdin", "-v", "error", "-i", path,
+        "-map", "0:v:0", "-c", "copy", "-f", "hash", "-hash", "sha256", "-",
+    ]
+    out = subprocess.run(cmd, capture_output=True, check=True).stdout.decode().strip()
+    return out.split("=", 1)[-1]
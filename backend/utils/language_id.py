@@ -0,0 +1,75 @@
+# backend/utils/language_id.py
+"""
+تحديد لغة الصوت بخطوة سريعة مستقلة قبل النسخ:
+- يفحص أول بضع نوافذ (30 ثانية لكل نافذة) فقط بنموذج صغير.
+- يخزّن النتيجة لكل بصمة صوت حتى لا تتكرر.
+"""
+import os
+
+from utils.whisper_registry import get_engine
+from utils import transcript_cache
+
+SAMPLE_RATE = 16000
+WINDOW_SAMPLES = 30 * SAMPLE_RATE
+MODEL_SIZE = os.getenv("LANGID_MODEL_SIZE", "base")
+WINDOWS = int(os.getenv("LANGID_WINDOWS", "3"))
+# لا نفرض اللغة المكتشفة على نموذج النسخ (الأكبر) إلا فوق هذه الثقة؛
+# دونها يكتشف نموذج النسخ اللغة بنفسه
+FORCE_CONFIDENCE = float(os.getenv("LANGID_FORCE_CONFIDENCE", "0.8"))
+
+
+def _detect(audio, model_size, windows):
+    engine = get_engine(model_size)
+    starts = list(range(0, max(len(audio), 1), WINDOW_SAMPLES))[:windows]
+    probs = engine.detect_language([audio[s:s + WINDOW_SAMPLES] for s in starts])
+
+    # متوسط الاحتمالات عبر النوافذ المفحوصة
+    totals = {}
+    for window_probs in probs:
+        for lang, p in window_probs.items():
+            totals[lang] = totals.get(lang, 0.0) + p / len(probs)
+    ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+    return {
+        "language": ranked[0][0],
+        "confidence": round(ranked[0][1], 4),
+        "candidates": {lang: round(p, 4) for lang, p in ranked[:5]},
+        "windows": len(starts),
+    }
+
+
+def detect_language(audio, model_size=MODEL_SIZE, windows=WINDOWS, digest=None):
+    """إرجاع {language, confidence, candidates} مع الاستفادة من الكاش حسب بصمة الصوت."""
+    digest = digest or transcript_cache.audio_hash(audio)
+    cached = transcript_cache.get_language(digest)
+    if cached is not None:
+        cached["cached"] = True
+        return cached
+
+    result = _detect(audio, model_size, windows)
+    transcript_cache.put_language(digest, result)
+    result["cached"] = False
+    return result
+
+
+def same_language(detected, target):
+    """مقارنة رمز اللغة المكتشف (مثل 'ar') مع رمز الهدف (مثل 'ar' أو 'zh-CN')."""
+    if not detected or not target:
+        return False
+    return detected.split("-")[0].lower() == target.split("-")[0].lower()
+
+
+def resolve_language(audio, source_lang, target_lang=None, digest=None):
+    """
+    مرحلة في خط المعالجة: تحديد لغة المصدر إن لم تُحدَّد، وإرجاع
+    (لغة المصدر، هل نحتاج للترجمة، اللغة المفروضة على النسخ).
+    اللغة المفروضة هي source_lang إن حُدِّدت، أو المكتشفة إذا تجاوزت ثقتها
+    FORCE_CONFIDENCE، وإلا None. digest: بصمة الصوت إن حُسبت مسبقًا.
+    """
+    if source_lang:
+        forced = language = source_lang
+    else:
+        detected = detect_language(audio, digest=digest)
+        language = detected["language"]
+        forced = language if detected.get("confidence", 0.0) >= FORCE_CONFIDENCE else None
+    needs_translation = bool(target_lang) and not same_language(language, target_lang)
+    return language, needs_translation, forced
@@ -0,0 +1,278 @@
+# backend/utils/long_form.py
+"""
+وضع النسخ للملفات الطويلة:
+- تقسيم الصوت المفكوك عند فترات الصمت إلى أجزاء محدودة الطول.
+- نسخ الأجزاء بالتوازي في عمليات منفصلة: مجموعة عمليات دائمة لكل حجم نموذج
+  (تُنشأ عند أول طلب طويل بهذا الحجم وتُعاد لكل الطلبات)، وذاكرة نماذجها محجوزة من
+  ميزانية utils.whisper_registry؛ عند امتلاء الميزانية تُوقف الأقدم استخدامًا (LRU)
+  ولا يُحرَّر حجزها إلا بعد خروج عملياتها فعلًا.
+- دمج النص والمقاطع (segments) مع إزاحة التوقيتات بترتيبها الأصلي.
+"""
+import os
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from utils import whisper_registry
+from utils.whisper_registry import get_engine
+
+SAMPLE_RATE = 16000
+# الملفات الأطول من هذه المدة (بالثواني) تمر تلقائيًا عبر الوضع الطويل
+LONG_FORM_MIN_SECONDS = float(os.getenv("LONG_FORM_MIN_SECONDS", "600"))
+# حدود طول الجزء الواحد بالثواني
+MAX_CHUNK_SECONDS = float(os.getenv("LONG_FORM_MAX_CHUNK_SECONDS", "120"))
+MIN_CHUNK_SECONDS = float(os.getenv("LONG_FORM_MIN_CHUNK_SECONDS", "30"))
+# طول الجزء في وضع البث: أجزاء أقصر = أول نص أسرع
+STREAM_CHUNK_SECONDS = float(os.getenv("STREAM_CHUNK_SECONDS", "20"))
+# عدد العمليات العاملة (كل عملية تحمل نسختها من النموذج)
+WORKERS = int(os.getenv("LONG_FORM_WORKERS", "2"))
+# أقصى انتظار (بالثواني) لخروج مجموعات أُوقفت لإفساح الميزانية قبل النسخ تسلسليًا
+RETIRE_WAIT_SECONDS = float(os.getenv("LONG_FORM_RETIRE_WAIT_SECONDS", "10"))
+
+logger = logging.getLogger(__name__)
+
+FRAME_SECONDS = 0.03
+SMOOTH_SECONDS = 0.3
+
+
+def find_split_points(audio, max_chunk_s=MAX_CHUNK_SECONDS, min_chunk_s=MIN_CHUNK_SECONDS):
+    """
+    إرجاع مواضع القطع (بالعينات) بحيث لا يتجاوز أي جزء max_chunk_s،
+    ويقع كل قطع عند أهدأ نقطة بين min_chunk_s و max_chunk_s من بداية الجزء.
+    """
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    n_frames = len(audio) // frame
+    max_f = int(max_chunk_s / FRAME_SECONDS)
+    min_f = min(int(min_chunk_s / FRAME_SECONDS), max_f - 1)
+    if n_frames <= max_f:
+        return [0, len(audio)]
+
+    # طاقة RMS لكل إطار ثم تنعيمها لتفضيل فترات الصمت المتصلة
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    energy = np.sqrt(np.mean(frames ** 2, axis=1) + 1e-12)
+    k = max(1, int(SMOOTH_SECONDS / FRAME_SECONDS))
+    smooth = np.convolve(energy, np.ones(k) / k, mode="same")
+
+    points = [0]
+    start = 0
+    while n_frames - start > max_f:
+        lo, hi = start + min_f, start + max_f
+        cut = lo + int(np.argmin(smooth[lo:hi]))
+        points.append(cut * frame)
+        start = cut
+    points.append(len(audio))
+    return points
+
+
+def split_on_silence(audio, max_chunk_s=MAX_CHUNK_SECONDS, min_chunk_s=MIN_CHUNK_SECONDS):
+    """تقسيم الصوت إلى قائمة (offset بالثواني، مصفوفة الجزء)."""
+    points = find_split_points(audio, max_chunk_s, min_chunk_s)
+    return [
+        (a / SAMPLE_RATE, audio[a:b])
+        for a, b in zip(points[:-1], points[1:])
+        if b > a
+    ]
+
+
+# ---------------------------------------------------------------------
+# العمليات العاملة: كل عملية تحمّل المحرك مرة واحدة عند بدئها
+_worker_engine = None
+
+
+def _init_worker(model_size, backend, threads):
+    global _worker_engine
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    _worker_engine = get_engine(model_size, backend)
+
+
+_pool_lock = threading.Lock()
+_pools = OrderedDict()    # (backend, size, workers) -> ProcessPoolExecutor، بترتيب الاستخدام
+_pools_pid = None
+
+
+def _reservation(key):
+    return "long_form:" + ":".join(str(part) for part in key)
+
+
+def _retire(key, pool):
+    """
+    إيقاف مجموعة في الخلفية: المهام الجارية تكتمل، وحجز ذاكرتها لا يُحرَّر إلا بعد
+    خروج عملياتها (ونماذجها). يُرجع Event يُضبط عند اكتمال ذلك.
+    """
+    done = threading.Event()
+
+    def shutdown():
+        try:
+            pool.shutdown(wait=True)
+        finally:
+            whisper_registry.release(_reservation(key))
+            done.set()
+
+    threading.Thread(target=shutdown, name="long-form-retire", daemon=True).start()
+    return done
+
+
+def _check_pid():
+    """بعد fork ترث العملية الابنة مجموعات الأب وحجوزاتها؛ ليست لها فتُنسى دون إيقاف (تحت _pool_lock)."""
+    global _pools_pid
+    if _pools_pid != os.getpid():
+        for key in _pools:
+            whisper_registry.release(_reservation(key))
+        _pools.clear()
+        _pools_pid = os.getpid()
+
+
+def _get_pool(model_size, workers, wait_for_retired=True):
+    """
+    مجموعة العمليات المشتركة لهذا الحجم، أو None إذا لم تتسع ميزانية الذاكرة
+    لنماذج العمليات العاملة (فينفذ المستدعي تسلسليًا عبر محرك هذه العملية).
+    """
+    from utils.asr_engine import ASR_BACKEND
+
+    key = (ASR_BACKEND, model_size, workers)
+    retiring = []
+    with _pool_lock:
+        _check_pid()
+        if key in _pools:
+            _pools.move_to_end(key)
+            return _pools[key]
+        needed = whisper_registry.estimate_mb(model_size) * workers
+        reserved = whisper_registry.reserve(_reservation(key), needed)
+        # إفساح الميزانية بإيقاف الأقدم استخدامًا؛ حجزها يبقى حتى تخرج عملياتها
+        while not reserved and _pools:
+            old_key, old_pool = _pools.popitem(last=False)
+            retiring.append(_retire(old_key, old_pool))
+            reserved = whisper_registry.reserve(_reservation(key), needed)
+        if reserved:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            _pools[key] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(model_size, ASR_BACKEND, threads)
+            )
+            return _pools[key]
+
+    # المجموعات الموقوفة الخاملة تخرج خلال لحظات؛ ننتظرها مرة واحدة ثم نعيد المحاولة
+    if retiring and wait_for_retired and all(done.wait(RETIRE_WAIT_SECONDS) for done in retiring):
+        return _get_pool(model_size, workers, wait_for_retired=False)
+    return None
+
+
+def _discard_pool(pool):
+    """التخلص من مجموعة تعطلت (مثل قتل عملية عاملة لنفاد الذاكرة) لتُنشأ من جديد لاحقًا."""
+    with _pool_lock:
+        for key, current in list(_pools.items()):
+            if current is pool:
+                del _pools[key]
+                _retire(key, pool)
+
+
+def _transcribe_chunk(index, chunk, language, engine=None):
+    engine = engine or _worker_engine
+    return index, engine.transcribe(chunk, language)
+
+
+def stitch_results(parts):
+    """دمج نتائج الأجزاء [(offset, result)] في نتيجة واحدة مرتبة."""
+    texts, segments = [], []
+    language = None
+    for offset, result in parts:
+        language = language or result.get("language")
+        text = result.get("text", "").strip()
+        if text:
+            texts.append(text)
+        for seg in result.get("segments", []):
+            seg = dict(seg)
+            seg["id"] = len(segments)
+            seg["start"] = round(seg["start"] + offset, 3)
+            seg["end"] = round(seg["end"] + offset, 3)
+            if seg.get("words"):
+                seg["words"] = [
+                    dict(w, start=round(w["start"] + offset, 3), end=round(w["end"] + offset, 3))
+                    for w in seg["words"]
+                ]
+            segments.append(seg)
+    return {"text": " ".join(texts), "segments": segments, "language": language}
+
+
+def transcribe_long_form(audio, model_size, language=None, workers=WORKERS):
+    """نسخ ملف طويل بالتوازي عبر أجزاء مقسمة عند الصمت."""
+    chunks = split_on_silence(audio)
+
+    # عمليات Celery (prefork) لا يمكنها إنشاء عمليات فرعية، لذا ننفذ تسلسليًا هناك
+    pool = None
+    if workers > 1 and len(chunks) > 1 and not multiprocessing.current_process().daemon:
+        pool = _get_pool(model_size, workers)
+
+    results = None
+    if pool is not None:
+        try:
+            futures = [
+                pool.submit(_transcribe_chunk, i, chunk, language)
+                for i, (_, chunk) in enumerate(chunks)
+            ]
+            results = [None] * len(chunks)
+            for future in futures:
+                index, result = future.result()
+                results[index] = result
+        except BrokenProcessPool as e:
+            # BrokenProcessPool يرث RuntimeError، لذا يُلتقط أولًا
+            logger.warning("Long-form pool broke (%s); transcribing sequentially", e)
+            _discard_pool(pool)
+            results = None
+        except RuntimeError as e:
+            # أُوقفت المجموعة (أُخليت لإفساح الميزانية لحجم آخر) قبل الإرسال
+            if "shutdown" not in str(e):
+                raise
+            logger.warning("Long-form pool was retired; transcribing sequentially")
+            results = None
+    if results is None:
+        engine = get_engine(model_size)
+        results = [_transcribe_chunk(i, chunk, language, engine)[1] for i, (_, chunk) in enumerate(chunks)]
+
+    return stitch_results([(offset, result) for (offset, _), result in zip(chunks, results)])
+
+
+def transcribe(audio, model_size, language=None, long_form=None):
+    """
+    نقطة الدخول الموحدة للنسخ: يختار الوضع الطويل تلقائيًا عندما تتجاوز
+    مدة الصوت LONG_FORM_MIN_SECONDS، أو عند تمرير long_form=True صراحةً.
+    """
+    if long_form is None:
+        long_form = len(audio) / SAMPLE_RATE >= LONG_FORM_MIN_SECONDS
+    if long_form:
+        return transcribe_long_form(audio, model_size, language)
+    return get_engine(model_size).transcribe(audio, language)
+
+
+def iter_segments(audio, model_size, language=None, chunk_seconds=STREAM_CHUNK_SECONDS):
+    """
+    نسخ تدريجي للبث: ينسخ الأجزاء القصيرة بالترتيب ويُرجع كل مقطع
+    (segment) بتوقيته المطلق فور انتهاء الجزء الذي يحتويه.
+    """
+    engine = get_engine(model_size)
+    index = 0
+    for offset, chunk in split_on_silence(audio, chunk_seconds, chunk_seconds / 2):
+        result = engine.transcribe(chunk, language)
+        # تثبيت اللغة بعد أول جزء حتى لا تتبدل بين الأجزاء
+        language = language or result.get("language")
+        for seg in result.get("segments", []):
+            text = seg.get("text", "").strip()
+            if not text:
+                continue
+            yield {
+                "id": index,
+                "start": round(seg["start"] + offset, 3),
+                "end": round(seg["end"] + offset, 3),
+                "text": text,
+                "language": language,
+            }
+            index += 1
@@ -0,0 +1,170 @@
+# backend/utils/model_policy.py
+"""
+سياسة اختيار حجم نموذج Whisper حسب الحمل:
+تأخذ مدة الوسائط، خطة المستخدم، عدد المهام الجارية وزمن الاستجابة المستهدف،
+وتنزل إلى نموذج أصغر عندما يتجاوز الزمن المقدّر الهدف.
+بدون حمل (لا مهام جارية) يُستخدم الحجم المفضَّل دائمًا؛ الحمل وحده هو ما ينزل بالحجم.
+عدد المهام الجارية مشترك بين كل العمليات (gunicorn / Celery) عبر جدول SQLite في data/.
+"""
+import os
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# من الأصغر إلى الأكبر
+SIZES = ["tiny", "base", "small", "medium", "large"]
+
+# ثوانٍ من الحساب لكل ثانية صوت على عقد CPU (قابلة للضبط من البيئة)
+REALTIME_FACTORS = {
+    size: float(os.getenv(f"WHISPER_RTF_{size.upper()}", default))
+    for size, default in (
+        ("tiny", "0.05"), ("base", "0.1"), ("small", "0.35"),
+        ("medium", "1.0"), ("large", "2.2"),
+    )
+}
+
+# أكبر نموذج مسموح لكل خطة
+PLAN_CEILING = {
+    "free": os.getenv("WHISPER_MAX_MODEL_FREE", "medium"),
+    "premium": os.getenv("WHISPER_MAX_MODEL_PREMIUM", "large"),
+}
+# سقف الخطة غير المعروفة (مثل encoding_profiles: غير المعروف يُعامل كالخطة الافتراضية لا المجانية)
+DEFAULT_CEILING = os.getenv("WHISPER_MAX_MODEL_DEFAULT", "large")
+# الزمن المستهدف = ثابت + نسبة من مدة الوسائط (الملف الأطول يحتمل انتظارًا أطول)
+LATENCY_TARGET_SECONDS = float(os.getenv("WHISPER_LATENCY_TARGET_SECONDS", "60"))
+LATENCY_TARGET_RTF = float(os.getenv("WHISPER_LATENCY_TARGET_RTF", "0.5"))
+# الهدف لا يقل عن زمن الحجم المفضَّل بلا حمل مضروبًا في هذا الهامش
+LOAD_HEADROOM = float(os.getenv("WHISPER_LOAD_HEADROOM", "1.5"))
+MIN_SIZE = os.getenv("WHISPER_MIN_MODEL", "tiny")
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+JOBS_DB = os.getenv("WHISPER_JOBS_DB", os.path.join(BASE_DIR, "data", "whisper_jobs.db"))
+# مهمة لم تُنهِ سجلها خلال هذه المدة (عملية قُتلت) لا تُحسب في الحمل
+JOB_STALE_SECONDS = float(os.getenv("WHISPER_JOB_STALE_SECONDS", "3600"))
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_init_lock = threading.Lock()
+_ready = False
+# احتياطي داخل العملية إذا تعذّر الوصول لقاعدة البيانات المشتركة
+_in_flight = 0
+
+
+@contextmanager
+def _db():
+    """اتصال قصير العمر مع commit عند النجاح ثم إغلاق."""
+    if not _ready:
+        _init()
+    conn = sqlite3.connect(JOBS_DB, timeout=30)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _init():
+    """إنشاء المجلد والجدول مرة واحدة عند أول استخدام (لا عند الاستيراد)."""
+    global _ready
+    if _ready:
+        return
+    with _init_lock:
+        if _ready:
+            return
+        os.makedirs(os.path.dirname(JOBS_DB), exist_ok=True)
+        conn = sqlite3.connect(JOBS_DB, timeout=30)
+        try:
+            with conn:
+                conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    pid INTEGER NOT NULL,
+                    started_at REAL NOT NULL
+                );
+                """)
+        finally:
+            conn.close()
+        _ready = True
+
+
+@contextmanager
+def track_job():
+    """تسجيل مهمة نسخ جارية (يُستخدم عددها في كل العمليات كعمق قائمة الانتظار)."""
+    global _in_flight
+    job_id = uuid.uuid4().hex
+    try:
+        with _db() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, pid, started_at) VALUES (?, ?, ?)",
+                (job_id, os.getpid(), time.time()),
+            )
+        shared = True
+    except sqlite3.Error as e:
+        logger.warning("Job tracking unavailable, counting locally: %s", e)
+        shared = False
+        with _lock:
+            _in_flight += 1
+    try:
+        yield
+    finally:
+        if shared:
+            try:
+                with _db() as conn:
+                    conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            except sqlite3.Error as e:
+                logger.warning("Could not clear job %s: %s", job_id, e)
+        else:
+            with _lock:
+                _in_flight -= 1
+
+
+def queue_depth():
+    """عدد مهام النسخ الجارية في كل العمليات (مع حذف السجلات المنتهية الصلاحية)."""
+    with _lock:
+        local = _in_flight
+    try:
+        with _db() as conn:
+            conn.execute("DELETE FROM jobs WHERE started_at < ?", (time.time() - JOB_STALE_SECONDS,))
+            return conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] + local
+    except sqlite3.Error:
+        return local
+
+
+def estimate_seconds(size, duration_s, depth=0):
+    """تقدير زمن النسخ: المهام الجارية تتقاسم المعالج مع هذه المهمة."""
+    return duration_s * REALTIME_FACTORS[size] * (1 + depth)
+
+
+def choose_model(duration_s, plan=None, preferred="large", depth=None, latency_target_s=None):
+    """
+    إرجاع (الحجم المختار، تفاصيل القرار). نبدأ من الأصغر بين المفضَّل وسقف الخطة،
+    ثم ننزل خطوة خطوة حتى يصبح الزمن المقدّر ضمن الهدف أو نصل للحد الأدنى.
+    الهدف الافتراضي لا يقل عن زمن حجم البداية بلا حمل × LOAD_HEADROOM، فلا ننزل
+    إلا مع وجود مهام جارية؛ latency_target_s الصريح يُطبَّق كما هو.
+    """
+    depth = queue_depth() if depth is None else depth
+    ceiling = PLAN_CEILING.get(plan, DEFAULT_CEILING)
+
+    index = min(SIZES.index(preferred), SIZES.index(ceiling))
+    target = latency_target_s or max(
+        LATENCY_TARGET_SECONDS + duration_s * LATENCY_TARGET_RTF,
+        estimate_seconds(SIZES[index], duration_s) * LOAD_HEADROOM,
+    )
+    floor = SIZES.index(MIN_SIZE)
+    while index > floor and estimate_seconds(SIZES[index], duration_s, depth) > target:
+        index -= 1
+
+    size = SIZES[index]
+    return size, {
+        "model": size,
+        "preferred": preferred,
+        "plan": plan if plan in PLAN_CEILING else "default",
+        "queue_depth": depth,
+        "duration": round(duration_s, 1),
+        "estimated_seconds": round(estimate_seconds(size, duration_s, depth), 1),
+        "latency_target": round(target, 1),
+    }
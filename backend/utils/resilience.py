@@ -0,0 +1,180 @@
+# backend/utils/resilience.py
+"""
+طبقة حماية لاستدعاءات المزوّدين الخارجيين (الترجمة وTTS):
+- مهلة قصوى لكل استدعاء (deadline) حتى لا يعلق worker داخل طلب بطيء.
+- طلب مكرر (hedged) إذا تأخر الرد عن حد معيّن، ونأخذ أول رد ناجح.
+- قاطع دائرة (circuit breaker): بعد عدة إخفاقات متتالية نفشل فورًا لفترة
+  ثم نسمح بطلب تجريبي واحد قبل إعادة الفتح.
+- عدّادات وزمن الاستجابة لكل مزوّد.
+
+الإعدادات لكل مزوّد من متغيرات البيئة بالبادئة {NAME}_، مثل:
+TRANSLATE_DEADLINE_SECONDS، TTS_HEDGE_AFTER_SECONDS، TTS_BREAKER_FAILURES.
+"""
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# القيم الافتراضية: (المهلة، بدء الطلب المكرر، إخفاقات فتح القاطع، مدة الفتح)
+DEFAULTS = {
+    "translate": (20.0, 3.0, 5, 30.0),
+    "tts": (60.0, 8.0, 5, 30.0),
+}
+MAX_CONCURRENT = int(os.getenv("UPSTREAM_MAX_CONCURRENT", "16"))
+
+
+class CircuitOpenError(Exception):
+    """المزوّد معطّل حاليًا (القاطع مفتوح)، لذا فشلنا دون الاتصال به."""
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failures, reset_seconds):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._probing = False
+            # في حالة half_open نسمح بطلب تجريبي واحد فقط
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self.state = "closed"
+                self._consecutive = 0
+                return
+            self._consecutive += 1
+            if self.state == "half_open" or self._consecutive >= self.failures:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class Upstream:
+    def __init__(self, name, deadline, hedge_after, failures, reset_seconds):
+        self.name = name
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.breaker = CircuitBreaker(failures, reset_seconds)
+        self._pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT, thread_name_prefix=f"upstream-{name}")
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=500)
+        self._stats = {
+            "calls": 0, "successes": 0, "failures": 0, "timeouts": 0,
+            "hedges": 0, "hedge_wins": 0, "short_circuits": 0,
+        }
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def call(self, fn, *args, deadline=None, hedge=True, **kwargs):
+        """
+        تنفيذ fn(*args, **kwargs) ضمن المهلة. يجب أن يكون الاستدعاء آمنًا للتكرار
+        (idempotent) إذا كان hedge=True.
+        """
+        if not self.breaker.allow():
+            self._count("short_circuits")
+            raise CircuitOpenError(f"{self.name} upstream is unavailable, try again later")
+        self._count("calls")
+
+        deadline = deadline or self.deadline
+        started = time.monotonic()
+        primary = self._pool.submit(fn, *args, **kwargs)
+        pending, hedged, error = {primary}, None, None
+        while pending:
+            elapsed = time.monotonic() - started
+            if elapsed >= deadline:
+                break
+            # ننتظر حتى موعد الطلب المكرر (إن لم يُرسل بعد) أو حتى نهاية المهلة
+            wait_for = deadline - elapsed
+            if hedge and self.hedge_after and hedged is None and error is None:
+                wait_for = min(wait_for, max(0.0, self.hedge_after - elapsed))
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._succeed(started, future is hedged)
+                    return future.result()
+                error = future.exception()
+            if (not done and hedge and self.hedge_after and hedged is None
+                    and time.monotonic() - started >= self.hedge_after):
+                self._count("hedges")
+                hedged = self._pool.submit(fn, *args, **kwargs)
+                pending.add(hedged)
+
+        self.breaker.record(False)
+        if not pending:
+            self._count("failures")
+            raise error
+        self._count("timeouts")
+        raise DeadlineExceeded(f"{self.name} upstream did not answer within {deadline:.0f}s")
+
+    def _succeed(self, started, hedge_won):
+        self.breaker.record(True)
+        with self._lock:
+            self._stats["successes"] += 1
+            if hedge_won:
+                self._stats["hedge_wins"] += 1
+            self._latencies.append(time.monotonic() - started)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            latencies = sorted(self._latencies)
+        if latencies:
+            data["p50_seconds"] = round(latencies[len(latencies) // 2], 3)
+            data["p95_seconds"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+        data["state"] = self.breaker.state
+        data["deadline_seconds"] = self.deadline
+        data["hedge_after_seconds"] = self.hedge_after
+        return data
+
+
+_lock = threading.Lock()
+_upstreams = {}
+
+
+def _env(name, key, default):
+    return type(default)(os.getenv(f"{name.upper()}_{key}", default))
+
+
+def get_upstream(name):
+    with _lock:
+        if name not in _upstreams:
+            deadline, hedge_after, failures, reset = DEFAULTS.get(name, (30.0, 0.0, 5, 30.0))
+            _upstreams[name] = Upstream(
+                name,
+                _env(name, "DEADLINE_SECONDS", deadline),
+                _env(name, "HEDGE_AFTER_SECONDS", hedge_after),
+                _env(name, "BREAKER_FAILURES", failures),
+                _env(name, "BREAKER_RESET_SECONDS", reset),
+            )
+        return _upstreams[name]
+
+
+def call(name, fn, *args, **kwargs):
+    """اختصار: get_upstream(name).call(fn, ...)"""
+    return get_upstream(name).call(fn, *args, **kwargs)
+
+
+def stats():
+    with _lock:
+        return {name: upstream.stats() for name, upstream in _upstreams.items()}
@@ -0,0 +1,289 @@
+# backend/utils/segment_store.py
+"""
+مخزن مضغوط للمقاطع الزمنية (segments) لكل وسائط، تقرؤه كل الأدوات اللاحقة
+(الترجمات المرئية، الترجمة، التلخيص، البحث) بدل إعادة النسخ أو تحليل ملفات نصية.
+
+كل وسائط لها مجلد data/segments/<key>/ فيه نسخ (v-<id>/) وملف CURRENT يشير لآخرها؛
+الحفظ يكتب نسخة جديدة كاملة ثم يبدّل المؤشر ذريًا (os.replace)، فلا يرى القارئ نسخة
+ناقصة ولا يتعارض كاتبان متزامنان لنفس المفتاح. كل نسخة تحتوي مصفوفات .npy تُفتح بـ mmap:
+- start / end: float32 لكل مقطع.
+- text_offsets + text.bin: جدول نصوص UTF-8 (المقطع i = bytes[off[i]:off[i+1]]).
+- token_offsets + tokens: رموز Whisper لكل مقطع (int32).
+- word_offsets + word_start / word_end + word_text_offsets + words.bin: توقيت الكلمات إن وُجد.
+- meta.json: اللغة والنموذج (وبصمة الملف النصي المقابل text_sha1 إن مُرِّرت).
+المستخدمون الذين حفظوا المفتاح تُسجَّل لهم علامة في owners/ (نفس الصوت قد يرفعه أكثر
+من مستخدم، فالمفتاح المبني على البصمة مشترك والملكية لكل منهم).
+"""
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+STORE_DIR = os.getenv("SEGMENT_STORE_DIR", os.path.join(BASE_DIR, "data", "segments"))
+# النسخ القديمة تُحذف بعد هذه المهلة فقط (قارئ ربما قرأ المؤشر ولم يفتح الملفات بعد)
+STALE_VERSION_SECONDS = float(os.getenv("SEGMENT_STALE_VERSION_SECONDS", "300"))
+
+
+def _key_dir(key):
+    # أسماء الملفات قد تحتوي أحرفًا غير آمنة؛ نضيف بصمة قصيرة لتفادي التصادم
+    safe = re.sub(r"[^A-Za-z0-9._-]", "_", key)[:100]
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:10]
+    return os.path.join(STORE_DIR, f"{safe}-{digest}")
+
+
+def _current_dir(key):
+    """مجلد النسخة الحالية للمفتاح، أو None إذا لم تُخزَّن بعد."""
+    entry = _key_dir(key)
+    try:
+        with open(os.path.join(entry, "CURRENT"), encoding="utf-8") as f:
+            path = os.path.join(entry, f.read().strip())
+    except FileNotFoundError:
+        # التخطيط القديم: الملفات مباشرة داخل مجلد المفتاح
+        path = entry
+    return path if os.path.exists(os.path.join(path, "meta.json")) else None
+
+
+def _prune(entry, own):
+    """حذف النسخ القديمة والنسخ غير المكتملة التي تجاوزت المهلة."""
+    cutoff = time.time() - STALE_VERSION_SECONDS
+    try:
+        with open(os.path.join(entry, "CURRENT"), encoding="utf-8") as f:
+            current = f.read().strip()
+    except FileNotFoundError:
+        current = None
+    for name in os.listdir(entry):
+        path = os.path.join(entry, name)
+        if name in (own, current) or not name.startswith("v-"):
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def _owner_path(key, owner):
+    return os.path.join(_key_dir(key), "owners", re.sub(r"[^A-Za-z0-9._-]", "_", str(owner)))
+
+
+def grant(key, owner):
+    """تسجيل owner كمالك للمفتاح (لا يغيّر النسخ المحفوظة)."""
+    if owner is None:
+        return
+    path = _owner_path(key, owner)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "a").close()
+
+
+def is_owner(key, owner):
+    return owner is not None and os.path.exists(_owner_path(key, owner))
+
+
+def text_digest(text):
+    """بصمة نص محفوظ في ملف (لمعرفة هل عدّله المستخدم بعد الحفظ)."""
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+def _offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _string_table(strings):
+    blobs = [s.encode("utf-8") for s in strings]
+    return _offsets([len(b) for b in blobs]), b"".join(blobs)
+
+
+def _load(path, name):
+    # mmap لا يدعم المصفوفات الفارغة، فنقرؤها عاديًا في هذه الحالة
+    try:
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+    except ValueError:
+        return np.load(os.path.join(path, f"{name}.npy"))
+
+
+def save(key, segments, language=None, model=None, owner=None, **meta):
+    """
+    حفظ مقاطع Whisper (قائمة dict) بشكل ذري تحت المفتاح المحدد.
+    owner: المستخدم الذي يحق له قراءتها عبر البحث (انظر grant).
+    meta: حقول إضافية لـ meta.json (مثل text_sha1).
+    """
+    texts = [seg.get("text", "").strip() for seg in segments]
+    start = np.array([seg["start"] for seg in segments], dtype=np.float32)
+    end = np.array([seg["end"] for seg in segments], dtype=np.float32)
+    text_offsets, text_blob = _string_table(texts)
+
+    tokens = [seg.get("tokens") or [] for seg in segments]
+    token_offsets = _offsets([len(t) for t in tokens])
+    flat_tokens = np.array([t for seg_tokens in tokens for t in seg_tokens], dtype=np.int32)
+
+    words = [seg.get("words") or [] for seg in segments]
+    word_offsets = _offsets([len(w) for w in words])
+    flat_words = [w for seg_words in words for w in seg_words]
+    word_start = np.array([w["start"] for w in flat_words], dtype=np.float32)
+    word_end = np.array([w["end"] for w in flat_words], dtype=np.float32)
+    word_text_offsets, word_blob = _string_table([w.get("word", "") for w in flat_words])
+
+    entry = _key_dir(key)
+    version = f"v-{uuid.uuid4().hex[:12]}"
+    tmp = os.path.join(entry, version)
+    os.makedirs(tmp)
+    arrays = {
+        "start": start, "end": end, "text_offsets": text_offsets,
+        "token_offsets": token_offsets, "tokens": flat_tokens,
+        "word_offsets": word_offsets, "word_start": word_start, "word_end": word_end,
+        "word_text_offsets": word_text_offsets,
+    }
+    pointer = os.path.join(entry, f".CURRENT.{version}")
+    try:
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), arr)
+        with open(os.path.join(tmp, "text.bin"), "wb") as f:
+            f.write(text_blob)
+        with open(os.path.join(tmp, "words.bin"), "wb") as f:
+            f.write(word_blob)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"key": key, "language": language, "model": model, "count": len(texts), **meta}, f)
+
+        # تبديل المؤشر بعد اكتمال الكتابة؛ آخر كاتب يفوز ولا يفشل أحد
+        with open(pointer, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(pointer, os.path.join(entry, "CURRENT"))
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if os.path.exists(pointer):
+            os.remove(pointer)
+        raise
+    grant(key, owner)
+    _prune(entry, version)
+    return tmp
+
+
+def exists(key):
+    return _current_dir(key) is not None
+
+
+def open_segments(key):
+    """فتح مقاطع الوسائط للقراءة، أو None إذا لم تُخزَّن بعد."""
+    path = _current_dir(key)
+    return Segments(path) if path else None
+
+
+def open_for_text(key, text_path):
+    """
+    فتح المقاطع فقط إذا كانت مطابقة للملف النصي المقابل (لم يعدّله المستخدم عبر
+    /api/save-text بعد الحفظ)؛ وإلا None ليقرأ المستدعي الملف نفسه.
+    """
+    segments = open_segments(key)
+    if segments is None or not os.path.exists(text_path):
+        return segments
+    with open(text_path, "r", encoding="utf-8") as f:
+        current = text_digest(f.read())
+    return segments if segments.meta.get("text_sha1") == current else None
+
+
+class Segments:
+    """عرض للقراءة فقط فوق المصفوفات المخزنة، مع وصول عشوائي سريع."""
+
+    def __init__(self, path):
+        self.path = path
+        load = lambda name: _load(path, name)
+        self.start = load("start")
+        self.end = load("end")
+        self._text_offsets = load("text_offsets")
+        self._token_offsets = load("token_offsets")
+        self._tokens = load("tokens")
+        self._word_offsets = load("word_offsets")
+        self._word_start = load("word_start")
+        self._word_end = load("word_end")
+        self._word_text_offsets = load("word_text_offsets")
+        with open(os.path.join(path, "text.bin"), "rb") as f:
+            self._text = f.read()
+        with open(os.path.join(path, "words.bin"), "rb") as f:
+            self._words = f.read()
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+    def __len__(self):
+        return len(self.start)
+
+    def text(self, i):
+        a, b = self._text_offsets[i], self._text_offsets[i + 1]
+        return self._text[a:b].decode("utf-8")
+
+    def texts(self):
+        return [self.text(i) for i in range(len(self))]
+
+    def full_text(self):
+        return " ".join(t for t in self.texts() if t)
+
+    def tokens(self, i):
+        return self._tokens[self._token_offsets[i]:self._token_offsets[i + 1]].tolist()
+
+    def words(self, i):
+        result = []
+        for w in range(self._word_offsets[i], self._word_offsets[i + 1]):
+            a, b = self._word_text_offsets[w], self._word_text_offsets[w + 1]
+            result.append({
+                "word": self._words[a:b].decode("utf-8"),
+                "start": float(self._word_start[w]),
+                "end": float(self._word_end[w]),
+            })
+        return result
+
+    def __getitem__(self, i):
+        return {
+            "id": i,
+            "start": float(self.start[i]),
+            "end": float(self.end[i]),
+            "text": self.text(i),
+        }
+
+    def at(self, seconds):
+        """فهرس المقطع الذي يغطي اللحظة المحددة (أو الأقرب قبلها)."""
+        return max(0, int(np.searchsorted(self.start, seconds, side="right")) - 1)
+
+    def window(self, t0, t1):
+        """كل المقاطع المتقاطعة مع الفترة [t0, t1]."""
+        lo = max(0, int(np.searchsorted(self.end, t0, side="left")))
+        hi = int(np.searchsorted(self.start, t1, side="right"))
+        return [self[i] for i in range(lo, hi)]
+
+    def search(self, query, limit=50):
+        """بحث نصي بسيط (غير حساس لحالة الأحرف) مع توقيت كل نتيجة."""
+        needle = query.casefold()
+        hits = []
+        for i in range(len(self)):
+            if needle in self.text(i).casefold():
+                hits.append(self[i])
+                if len(hits) >= limit:
+                    break
+        return hits
+
+    def subtitles(self):
+        """قائمة ((start, end), text) بالصيغة التي يتوقعها SubtitlesClip."""
+        return [
+            ((float(self.start[i]), float(self.end[i])), self.text(i))
+            for i in range(len(self)) if self.text(i)
+        ]
+
+
+def translated_key(key):
+    """مفتاح آخر ترجمة محفوظة لوسائط معينة."""
+    return f"{key}:translated"
+
+
+def save_translation(key, source, texts, language, **meta):
+    """حفظ ترجمة بنفس توقيت المقاطع الأصلية تحت مفتاح مشتق."""
+    segments = [
+        {"start": float(source.start[i]), "end": float(source.end[i]), "text": texts[i]}
+        for i in range(len(source))
+    ]
+    return save(key, segments, language=language, model=source.meta.get("model"), **meta)
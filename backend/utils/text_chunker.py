@@ -0,0 +1,137 @@
+# backend/utils/text_chunker.py
+"""
+تقسيم النصوص إلى جمل وتجميعها في أجزاء ضمن حد معيّن، مشترك بين الترجمة وTTS:
+- يعرف علامات نهاية الجملة اللاتينية والعربية والصينية/اليابانية والديفاناغارية.
+- الحد إما بعدد الأحرف (unit="chars") أو بعدد بايتات UTF-8 (unit="bytes"، حدود TTS بالبايت).
+- لا يُقسم بعد الاختصارات الشائعة (Mr. / Dr. / e.g.) ولا بعد الأحرف الأولى من الأسماء (J.).
+- كل شيء يتم بمرور واحد على النص (زمن خطي)، والتجميع جشع (greedy).
+"""
+import re
+
+# علامات تتطلب مسافة بعدها (حتى لا نقسم 3.14 أو e.g.)
+_SPACED_TERMINATORS = ".!?…"
+# علامات تنهي الجملة حتى بدون مسافة: ؟ ۔ (عربي/أردو)، 。！？｡ (CJK)، । ॥ (ديفاناغاري)
+_TERMINATORS = "؟۔。！？｡।॥"
+
+# الفاصل: مسافات بعد علامة نهاية، أو أي سطر جديد
+_SEPARATOR_RE = re.compile(
+    rf"((?<=[{_SPACED_TERMINATORS}])\s+|(?<=[{_TERMINATORS}])\s*|\s*\n\s*)"
+)
+
+# كلمات تنتهي بنقطة دون أن تنهي الجملة (تُقارن بأحرف صغيرة وبدون النقطة الأخيرة)
+_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "e.g", "i.e",
+    "no", "fig", "inc", "ltd", "co", "corp", "dept", "approx", "vol", "p", "pp",
+}
+
+
+def _is_abbreviation(sentence, separator):
+    """
+    نقطة لا تنهي الجملة: بعد اختصار معروف، أو حرف أول من اسم (J.)، أو كلمة بنقاط
+    داخلية (U.S. / a.m.).
+    """
+    if not sentence.endswith(".") or not separator or "\n" in separator:
+        return False
+    word = sentence.split()[-1].lstrip("(\"'").rstrip(".")
+    return word.lower() in _ABBREVIATIONS or len(word) == 1 or "." in word
+
+
+def measure(text, unit="chars"):
+    return len(text.encode("utf-8")) if unit == "bytes" else len(text)
+
+
+def _hard_split(sentence, limit, separator, unit):
+    """تقسيم جملة أطول من الحد عند المسافات، أو قطعها عند حد الحرف إن لم توجد مسافات."""
+    if unit == "bytes":
+        data, space = sentence.encode("utf-8"), b" "
+    else:
+        data, space = sentence, " "
+    if len(data) <= limit:
+        return [(sentence, separator)]
+
+    pieces, start = [], 0
+    while len(data) - start > limit:
+        end = start + limit
+        cut = data.rfind(space, start, end + 1)
+        if cut > start:
+            pieces.append((data[start:cut], " "))
+            start = cut + 1
+            while start < len(data) and data[start:start + 1] == space:
+                start += 1
+            continue
+        if unit == "bytes":
+            # عدم قطع حرف متعدد البايتات: نرجع إلى بداية الحرف
+            while end > start + 1 and (data[end] & 0xC0) == 0x80:
+                end -= 1
+        pieces.append((data[start:end], ""))
+        start = end
+    pieces.append((data[start:], separator))
+    if unit == "bytes":
+        pieces = [(piece.decode("utf-8"), sep) for piece, sep in pieces]
+    return pieces
+
+
+def split_sentences(text, limit=None, unit="chars"):
+    """
+    إرجاع [(الجملة، الفاصل بعدها)] بالترتيب، بحيث يعيد "".join(s + sep) النص الأصلي
+    (باستثناء المسافات عند القطع القسري)، ولا تتجاوز أي جملة الحد إن حُدِّد.
+    """
+    parts = _SEPARATOR_RE.split(text)
+    result = []
+    carry = ""
+    for i in range(0, len(parts), 2):
+        sentence = parts[i]
+        separator = parts[i + 1] if i + 1 < len(parts) else ""
+        if not sentence:
+            # فاصل صفري الطول بعد علامة في نهاية النص
+            if result and separator:
+                result[-1] = (result[-1][0], result[-1][1] + separator)
+            continue
+        sentence = carry + sentence
+        carry = ""
+        if i + 2 < len(parts) and parts[i + 2] and _is_abbreviation(sentence, separator):
+            # الجملة تكمل في الجزء التالي
+            carry = sentence + separator
+            continue
+        if limit:
+            result.extend(_hard_split(sentence, limit, separator, unit))
+        else:
+            result.append((sentence, separator))
+    return result
+
+
+def pack(units, limit, unit="chars", joiner="\n"):
+    """تجميع جشع لقائمة جمل في دفعات لا يتجاوز طولها (مع الفواصل) الحد."""
+    joiner_size = measure(joiner, unit)
+    batches, current, size = [], [], 0
+    for item in units:
+        item_size = measure(item, unit)
+        if current and size + joiner_size + item_size > limit:
+            batches.append(current)
+            current, size = [], 0
+        size += item_size + (joiner_size if current else 0)
+        current.append(item)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def chunk_text(text, limit, unit="chars"):
+    """
+    تقسيم نص إلى أجزاء ≤ limit دون قطع الجمل (إلا الجمل الأطول من الحد نفسه)،
+    مع الإبقاء على الفواصل الأصلية بين الجمل داخل كل جزء.
+    """
+    chunks, current, size = [], "", 0
+    pending_sep = ""
+    for sentence, separator in split_sentences(text, limit, unit):
+        sentence_size = measure(sentence, unit)
+        sep_size = measure(pending_sep, unit)
+        if current and size + sep_size + sentence_size > limit:
+            chunks.append(current)
+            current, size, pending_sep, sep_size = "", 0, "", 0
+        current += pending_sep + sentence
+        size += sep_size + sentence_size
+        pending_sep = separator
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,188 @@
+# backend/utils/transcript_cache.py
+"""
+كاش دائم للنصوص المنسوخة، مفتاحه بصمة الصوت المفكوك + حجم النموذج + لغة المصدر.
+- التخزين في SQLite داخل مجلد data/.
+- إخلاء LRU عند تجاوز الحجم الأقصى (TRANSCRIPT_CACHE_MAX_MB).
+- عدّادات hit / miss على مستوى العملية.
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+CACHE_DB = os.getenv("TRANSCRIPT_CACHE_DB", os.path.join(BASE_DIR, "data", "transcript_cache.db"))
+MAX_BYTES = int(float(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_init_lock = threading.Lock()
+_ready = False
+
+
+@contextmanager
+def _db():
+    """اتصال قصير العمر مع commit عند النجاح ثم إغلاق."""
+    if not _ready:
+        _init()
+    conn = sqlite3.connect(CACHE_DB, timeout=30)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _init():
+    """إنشاء المجلد والجداول مرة واحدة عند أول استخدام (لا عند الاستيراد)."""
+    global _ready
+    if _ready:
+        return
+    with _init_lock:
+        if _ready:
+            return
+        os.makedirs(os.path.dirname(CACHE_DB), exist_ok=True)
+        conn = sqlite3.connect(CACHE_DB, timeout=30)
+        try:
+            with conn:
+                conn.execute("""
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    key TEXT PRIMARY KEY,
+                    audio_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                """)
+                # نتائج تحديد اللغة لكل بصمة صوت (صغيرة، لا تحتاج إخلاء)
+                conn.execute("""
+                CREATE TABLE IF NOT EXISTS languages (
+                    audio_hash TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                """)
+        finally:
+            conn.close()
+        _ready = True
+
+
+def audio_hash(audio):
+    """بصمة SHA-256 لعينات الصوت المفكوك (مستقلة عن صيغة الحاوية أو اسم الملف)."""
+    return hashlib.sha256(audio.tobytes()).hexdigest()
+
+
+def _model_id(model_size):
+    # محركات ASR المختلفة تعطي نصوصًا مختلفة، لذا يدخل الـ backend في المفتاح
+    from utils.asr_engine import ASR_BACKEND
+    return f"{ASR_BACKEND}:{model_size}"
+
+
+def _key(digest, model_size, language, mode="full"):
+    # mode يفصل النتائج المختصرة (دفعات، أجزاء البث) عن النسخ الكامل بنفس الصوت
+    key = f"{digest}:{_model_id(model_size)}:{language or 'auto'}"
+    return key if mode == "full" else f"{key}:{mode}"
+
+
+def get(digest, model_size, language=None, mode="full"):
+    """إرجاع النتيجة المخزنة {text, segments, language} أو None."""
+    key = _key(digest, model_size, language, mode)
+    with _lock, _db() as conn:
+        row = conn.execute("SELECT payload FROM transcripts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            _stats["misses"] += 1
+            return None
+        conn.execute("UPDATE transcripts SET last_access = ? WHERE key = ?", (time.time(), key))
+        _stats["hits"] += 1
+    return json.loads(row[0])
+
+
+def put(digest, model_size, language, result, mode="full"):
+    """تخزين نتيجة النسخ ثم إخلاء الأقدم استخدامًا إن تجاوز الكاش حجمه الأقصى."""
+    payload = json.dumps({
+        "text": result.get("text", ""),
+        "segments": result.get("segments", []),
+        "language": result.get("language"),
+    }, ensure_ascii=False, default=float)
+    now = time.time()
+    with _lock, _db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO transcripts "
+            "(key, audio_hash, model, language, payload, size, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (_key(digest, model_size, language, mode), digest, _model_id(model_size), language or "auto",
+             payload, len(payload.encode("utf-8")), now, now)
+        )
+        _stats["stores"] += 1
+        _evict(conn)
+
+
+def _evict(conn):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+    for key, size in conn.execute(
+        "SELECT key, size FROM transcripts ORDER BY last_access ASC"
+    ).fetchall():
+        if total <= MAX_BYTES:
+            break
+        conn.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+        total -= size
+        _stats["evictions"] += 1
+
+
+def get_language(digest):
+    with _db() as conn:
+        row = conn.execute("SELECT payload FROM languages WHERE audio_hash = ?", (digest,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def put_language(digest, result):
+    with _db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO languages (audio_hash, payload, created_at) VALUES (?, ?, ?)",
+            (digest, json.dumps(result), time.time())
+        )
+
+
+def cached_transcribe(audio, model_size, language=None, long_form=None, transcribe_fn=None, mode="full",
+                      digest=None):
+    """
+    النسخ عبر الكاش: يُرجع النتيجة المخزنة فورًا، أو ينسخ ويخزّن عند عدم وجودها.
+    transcribe_fn يسمح باستبدال مسار النسخ (مثل الدفعات المشتركة) بنفس الواجهة،
+    و mode يحدد مساحة مفاتيحه في الكاش (مثل batch_scheduler.CACHE_MODE).
+    digest: بصمة الصوت إن حسبها المستدعي مسبقًا (audio_hash).
+    """
+    if transcribe_fn is None:
+        from utils.long_form import transcribe as transcribe_fn
+
+    digest = digest or audio_hash(audio)
+    result = get(digest, model_size, language, mode)
+    if result is not None:
+        result.update(cached=True, model=model_size)
+        return result
+
+    result = transcribe_fn(audio, model_size, language, long_form)
+    put(digest, model_size, language, result, mode)
+    result.update(cached=False, model=model_size)
+    return result
+
+
+def stats():
+    with _lock, _db() as conn:
+        entries, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts"
+        ).fetchone()
+        data = dict(_stats)
+    lookups = data["hits"] + data["misses"]
+    data["hit_rate"] = round(data["hits"] / lookups, 3) if lookups else 0.0
+    data["entries"] = entries
+    data["size_mb"] = round(total / (1024 * 1024), 2)
+    data["max_mb"] = round(MAX_BYTES / (1024 * 1024), 2)
+    return data
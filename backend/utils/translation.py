@@ -0,0 +1,97 @@
+# backend/utils/translation.py
+"""
+خدمة الترجمة الموحدة لكل المسارات:
+- تقسيم النص إلى جمل، والبحث عنها أولًا في ذاكرة الترجمة (translation_memory).
+- إرسال الجمل غير الموجودة فقط إلى GoogleTranslator، مجمّعة في طلبات ≤ 4900 حرف
+  تُنفَّذ بالتوازي مع حد معدّل مشترك (translation_executor).
+- إعادة تركيب النص بنفس ترتيبه وفواصله الأصلية، مع مسافة بين الجمل إذا كانت لغة
+  الهدف تكتب بمسافات والمصدر لا (zh → en مثلًا) والعكس.
+"""
+from utils import translation_memory, translation_executor, text_chunker, resilience
+
+# الحد الأقصى لطول الطلب الواحد للمزوّد (نفس الحد المستخدم في split_text سابقًا)
+UPSTREAM_LIMIT = 4900
+
+# لغات لا تُفصل جملها بمسافات
+_UNSPACED_LANGUAGES = {"zh", "ja", "th", "lo", "km", "my"}
+
+
+def is_supported_language(code):
+    """هل يقبل المزوّد هذا الرمز (أو الاسم) كلغة؟ للتحقق من مدخلات المستخدم قبل استخدامها."""
+    from deep_translator.constants import GOOGLE_LANGUAGES_TO_CODES
+
+    code = (code or "").strip().lower()
+    return bool(code) and any(
+        code == value.lower() or code == name for name, value in GOOGLE_LANGUAGES_TO_CODES.items()
+    )
+
+
+def split_sentences(text, limit=UPSTREAM_LIMIT):
+    """إرجاع [(الجملة، الفاصل بعدها)] بحيث لا تتجاوز أي جملة حد الطلب."""
+    return text_chunker.split_sentences(text, limit)
+
+
+def _translate_lines(translator, batch):
+    """
+    ترجمة أسطر بطلب واحد؛ إذا دمج المزوّد أسطرًا أو قسمها (عدد مختلف) تُقسم الدفعة
+    نصفين ويُعاد كل نصف، فلا تصل إلى طلب لكل جملة إلا في أسوأ حالة.
+    """
+    # كل استدعاء للمزوّد بمهلة وطلب مكرر وقاطع دائرة (utils.resilience)
+    lines = (resilience.call("translate", translator.translate, "\n".join(batch)) or "").split("\n")
+    if len(lines) == len(batch):
+        return [line.strip() for line in lines]
+    if len(batch) == 1:
+        return [" ".join(line.strip() for line in lines if line.strip())]
+    middle = len(batch) // 2
+    return _translate_lines(translator, batch[:middle]) + _translate_lines(translator, batch[middle:])
+
+
+def _upstream(batch, target, source="auto"):
+    """ترجمة دفعة جمل (سطر لكل جملة) عبر GoogleTranslator."""
+    from deep_translator import GoogleTranslator
+
+    translator = GoogleTranslator(source=source or "auto", target=target)
+    return _translate_lines(translator, batch)
+
+
+def translate_units(units, target, source="auto", translator=None):
+    """
+    ترجمة قائمة جمل مع ذاكرة الترجمة: الموجود يُعاد فورًا والباقي يُرسل للمزوّد.
+    translator(batch, target, source) -> [ترجمات] يسمح باستبدال المزوّد (مثلًا بمترجم محلي).
+    """
+    unique = [u for u in dict.fromkeys(units) if u.strip()]
+    found = translation_memory.lookup(unique, target, source)
+    misses = [u for u in unique if u not in found]
+
+    batches = text_chunker.pack(misses, UPSTREAM_LIMIT)
+    results = translation_executor.map_ordered(translator or _upstream, batches, target, source)
+    pairs = [pair for batch, translated in zip(batches, results) for pair in zip(batch, translated)]
+    found.update(pairs)
+    translation_memory.store(pairs, target, source)
+
+    return [found.get(u, "") if u.strip() else u for u in units]
+
+
+def _separator_for(separator, target):
+    """الفاصل الأصلي بين جملتين بعد تكييفه لطريقة كتابة لغة الهدف."""
+    if "\n" in separator:
+        return separator
+    unspaced = (target or "").lower().split("-")[0] in _UNSPACED_LANGUAGES
+    if unspaced:
+        return ""
+    return separator or " "
+
+
+def translate_texts(texts, target, source="auto", translator=None):
+    """ترجمة عدة نصوص (مثل أسطر المقاطع) مع الحفاظ على عددها وترتيبها."""
+    split = [split_sentences(text) for text in texts]
+    units = [sentence for pieces in split for sentence, _ in pieces]
+    translated = iter(translate_units(units, target, source, translator))
+    return [
+        "".join(next(translated) + _separator_for(separator, target) for _, separator in pieces).strip()
+        for pieces in split
+    ]
+
+
+def translate_text(text, target, source="auto", translator=None):
+    return translate_texts([text], target, source, translator)[0]
@@ -0,0 +1,186 @@
+# backend/utils/translation_coalescer.py
+"""
+تجميع طلبات الترجمة القصيرة القادمة من طلبات متزامنة (coalescing):
+تُجمع النصوص لنفس زوج اللغات خلال نافذة زمنية صغيرة حتى حد 4900 حرف،
+وتُترجم معًا عبر خدمة الترجمة (طلب واحد للمزوّد بدل طلب لكل نص)،
+ثم تُعاد ترجمة كل نص إلى صاحبه عبر Future.
+الدفعة المجمّعة تُسلَّم لمجموعة threads وينتقل المجمِّع فورًا لجمع الدفعة التالية،
+فلا ينتظر زوج اللغات كله خلف طلب مزوّد بطيء.
+
+مثل batch_scheduler، التجميع داخل العملية الواحدة (gunicorn --threads).
+المجمِّع لكل زوج لغات ينتهي بعد فترة خمول، وعدد المجمِّعات محدود، واللغة الهدف
+يجب أن تكون مدعومة (تأتي من مدخلات المستخدم).
+"""
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+from utils import resilience
+from utils.translation import UPSTREAM_LIMIT, is_supported_language, translate_text, translate_texts
+from utils.translation_executor import WORKERS
+
+MAX_WAIT_MS = float(os.getenv("TRANSLATE_COALESCE_WAIT_MS", "15"))
+# دفعات قيد الترجمة في نفس الوقت (لكل أزواج اللغات)؛ منفصلة عن مجموعة المنفّذ
+# لأن translate_texts نفسها قد ترسل مهامًا إليها وتنتظرها
+DISPATCH_WORKERS = int(os.getenv("TRANSLATE_COALESCE_WORKERS", str(WORKERS)))
+# المجمِّع الخامل لهذه المدة ينهي thread الخاص به ويُزال
+IDLE_SECONDS = float(os.getenv("TRANSLATE_COALESCE_IDLE_SECONDS", "60"))
+# أقصى عدد أزواج لغات لها مجمِّع في نفس الوقت؛ الزائد يُترجم مباشرة دون تجميع
+MAX_COALESCERS = int(os.getenv("TRANSLATE_COALESCE_MAX_PAIRS", "32"))
+
+_dispatch = ThreadPoolExecutor(max_workers=DISPATCH_WORKERS, thread_name_prefix="translate-coalesce")
+
+
+class Coalescer:
+    def __init__(self, source, target, max_chars=UPSTREAM_LIMIT, max_wait_ms=MAX_WAIT_MS):
+        self.source = source
+        self.target = target
+        self.max_chars = max_chars
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._carry = None  # نص لم يتسع في الدفعة السابقة
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "max_batch_seen": 0, "in_flight": 0}
+        self._thread = threading.Thread(
+            target=self._run, name=f"translate-coalesce-{source}-{target}", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def translate(self, text, timeout=None):
+        return wait(self.submit(text), timeout)
+
+    def _collect(self):
+        """
+        أول نص ثم ما يصل خلال max_wait ما دام المجموع ضمن max_chars.
+        يُرجع None إذا لم يصل شيء خلال IDLE_SECONDS.
+        """
+        try:
+            first = self._carry or self._queue.get(timeout=IDLE_SECONDS)
+        except queue.Empty:
+            return None
+        self._carry = None
+        batch, size = [first], len(first[0]) + 1
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if size + len(item[0]) + 1 > self.max_chars:
+                self._carry = item
+                break
+            batch.append(item)
+            size += len(item[0]) + 1
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                # الإزالة تحت نفس القفل الذي يُرسَل تحته في translate()، فلا يضيع نص
+                with _lock:
+                    if self._queue.empty() and self._carry is None:
+                        _coalescers.pop((self.source, self.target), None)
+                        return
+                continue
+            with self._stats_lock:
+                self._stats["in_flight"] += 1
+            _dispatch.submit(self._translate, batch)
+
+    def _translate(self, batch):
+        try:
+            results = translate_texts([text for text, _ in batch], self.target, self.source)
+            if len(results) != len(batch):
+                raise RuntimeError(f"Expected {len(batch)} translations, got {len(results)}")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            with self._stats_lock:
+                self._stats["in_flight"] -= 1
+
+        with self._stats_lock:
+            self._stats["requests"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], len(batch))
+        for (_, future), translated in zip(batch, results):
+            future.set_result(translated)
+
+    def stats(self):
+        with self._stats_lock:
+            data = dict(self._stats)
+        data["languages"] = f"{self.source}->{self.target}"
+        data["pending"] = self._queue.qsize()
+        data["avg_batch"] = round(data["requests"] / data["batches"], 2) if data["batches"] else 0.0
+        return data
+
+
+_lock = threading.Lock()
+_coalescers = {}
+
+
+def wait(future, timeout=None):
+    """انتظار الترجمة بحد أقصى مهلة المزوّد (utils.resilience) ونافذة التجميع."""
+    if timeout is None:
+        timeout = resilience.get_upstream("translate").deadline + MAX_WAIT_MS / 1000.0
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        raise resilience.DeadlineExceeded(f"translation did not finish within {timeout:.0f}s")
+
+
+def _get_coalescer(key):
+    """المجمِّع لزوج اللغات (تحت _lock)، أو None إذا بلغ العدد MAX_COALESCERS."""
+    if key not in _coalescers:
+        if len(_coalescers) >= MAX_COALESCERS:
+            return None
+        _coalescers[key] = Coalescer(*key)
+    return _coalescers[key]
+
+
+def _validate(target, source):
+    """اللغات تأتي من مدخلات المستخدم؛ ValueError لغير المدعومة."""
+    if not is_supported_language(target) or (source not in (None, "", "auto") and not is_supported_language(source)):
+        raise ValueError(f"Unsupported language '{target}'")
+
+
+def submit(text, target, source="auto"):
+    """
+    إرسال نص للترجمة دون انتظار؛ يُرجع Future تُقرأ نتيجته عبر wait().
+    النصوص القصيرة تمر عبر التجميع، والأطول من حد الطلب الواحد (أو عند بلوغ عدد
+    المجمِّعات حده) تُترجم مباشرة في مجمّع الإرسال. يرفع ValueError للغة غير مدعومة.
+    """
+    _validate(target, source)
+    if len(text) < UPSTREAM_LIMIT:
+        with _lock:
+            coalescer = _get_coalescer((source or "auto", target))
+            if coalescer is not None:
+                return coalescer.submit(text)
+    return _dispatch.submit(translate_text, text, target, source)
+
+
+def translate(text, target, source="auto"):
+    """
+    نفس واجهة utils.translation.translate_text: النصوص القصيرة عبر submit ثم wait،
+    والأطول من حد الطلب الواحد تُترجم مباشرة (عدة طلبات، فلا تُقيَّد بمهلة طلب واحد).
+    """
+    if len(text) >= UPSTREAM_LIMIT:
+        _validate(target, source)
+        return translate_text(text, target, source)
+    return wait(submit(text, target, source))
+
+
+def stats():
+    with _lock:
+        return [c.stats() for c in _coalescers.values()]
@@ -0,0 +1,110 @@
+# backend/utils/translation_executor.py
+"""
+تنفيذ طلبات الترجمة للمزوّد بالتوازي بدل الانتظار المتسلسل (sleep(1)):
+- مجموعة threads محدودة (TRANSLATE_WORKERS) مشتركة على مستوى العملية.
+- حد معدّل token bucket مشترك لكل الطلبات المتجهة للمزوّد في هذه العملية.
+- إعادة المحاولة مع تأخير متزايد عند الفشل (لكن ليس عند تجاوز المهلة: مزوّد عالق
+  يُعاد فورًا للمستدعي بدل حجز الـ worker لعدة مهل متتالية).
+- إرجاع النتائج بنفس ترتيب الدفعات.
+دالة الترجمة تُمرَّر كمعامل، لذا يمكن تجربتها بمترجم محلي بدل المزوّد.
+"""
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.resilience import CircuitOpenError, DeadlineExceeded
+
+WORKERS = int(os.getenv("TRANSLATE_WORKERS", "4"))
+# عدد الطلبات المسموح بها في الثانية، وأقصى دفعة فورية
+RATE_PER_SECOND = float(os.getenv("TRANSLATE_RATE_PER_SECOND", "2"))
+BURST = int(os.getenv("TRANSLATE_BURST", "4"))
+RETRIES = int(os.getenv("TRANSLATE_RETRIES", "3"))
+BACKOFF_SECONDS = float(os.getenv("TRANSLATE_BACKOFF_SECONDS", "0.5"))
+
+
+class TokenBucket:
+    """حد معدّل بسيط: رصيد يمتلئ بمعدّل ثابت حتى سعة قصوى، وكل طلب يستهلك وحدة."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """الانتظار حتى تتوفر وحدة، وإرجاع مدة الانتظار بالثواني."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_bucket = TokenBucket(RATE_PER_SECOND, BURST)
+_pool = None
+_pool_lock = threading.Lock()
+_lock = threading.Lock()
+_stats = {"requests": 0, "retries": 0, "failures": 0, "throttled_seconds": 0.0}
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="translate")
+        return _pool
+
+
+def _call(fn, batch, args, retries, backoff):
+    for attempt in range(retries + 1):
+        waited = _bucket.acquire()
+        with _lock:
+            _stats["requests"] += 1
+            _stats["throttled_seconds"] += waited
+        try:
+            return fn(batch, *args)
+        except Exception as e:
+            # لا فائدة من إعادة المحاولة والقاطع مفتوح، ولا بعد استنفاد مهلة الطلب
+            if attempt == retries or isinstance(e, (CircuitOpenError, DeadlineExceeded)):
+                with _lock:
+                    _stats["failures"] += 1
+                raise
+            with _lock:
+                _stats["retries"] += 1
+            # تأخير أُسّي مع قدر عشوائي صغير حتى لا تتزامن المحاولات
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.5))
+
+
+def map_ordered(fn, batches, *args, retries=RETRIES, backoff=BACKOFF_SECONDS):
+    """
+    تنفيذ fn(batch, *args) لكل دفعة بالتوازي وإرجاع النتائج بنفس الترتيب.
+    أول خطأ نهائي (بعد استنفاد المحاولات) يُرفع للمستدعي.
+    """
+    batches = list(batches)
+    if len(batches) <= 1:
+        return [_call(fn, batch, args, retries, backoff) for batch in batches]
+    pool = _get_pool()
+    futures = [pool.submit(_call, fn, batch, args, retries, backoff) for batch in batches]
+    return [future.result() for future in futures]
+
+
+def stats():
+    with _lock:
+        data = dict(_stats)
+    data["throttled_seconds"] = round(data["throttled_seconds"], 2)
+    data["workers"] = WORKERS
+    data["rate_per_second"] = RATE_PER_SECOND
+    data["burst"] = BURST
+    return data
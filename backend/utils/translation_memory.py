@@ -0,0 +1,156 @@
+# backend/utils/translation_memory.py
+"""
+ذاكرة ترجمة دائمة على مستوى الجملة، مشتركة بين كل مسارات الترجمة:
+- المفتاح: لغة المصدر + لغة الهدف + بصمة الجملة بعد التطبيع.
+- إخلاء حسب العمر (TM_TTL_DAYS) ثم LRU عند تجاوز TM_MAX_ENTRIES.
+- عدّادات hit / miss على مستوى العملية.
+"""
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from contextlib import contextmanager
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+TM_DB = os.getenv("TM_DB", os.path.join(BASE_DIR, "data", "translation_memory.db"))
+MAX_ENTRIES = int(os.getenv("TM_MAX_ENTRIES", "200000"))
+TTL_SECONDS = float(os.getenv("TM_TTL_DAYS", "30")) * 86400
+# نفحص الإخلاء كل عدد معين من الإضافات بدل كل مرة
+EVICT_EVERY = 500
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_writes_since_evict = 0
+_init_lock = threading.Lock()
+_ready = False
+
+
+@contextmanager
+def _db():
+    if not _ready:
+        _init()
+    conn = sqlite3.connect(TM_DB, timeout=30)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _init():
+    """إنشاء المجلد والجداول مرة واحدة عند أول استخدام (لا عند الاستيراد)."""
+    global _ready
+    if _ready:
+        return
+    with _init_lock:
+        if _ready:
+            return
+        os.makedirs(os.path.dirname(TM_DB), exist_ok=True)
+        conn = sqlite3.connect(TM_DB, timeout=30)
+        try:
+            with conn:
+                conn.execute("""
+                CREATE TABLE IF NOT EXISTS tm (
+                    key TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    translated TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS tm_last_access ON tm (last_access)")
+        finally:
+            conn.close()
+        _ready = True
+
+
+def normalize(sentence):
+    """تطبيع Unicode (NFC) وتوحيد المسافات حتى تتطابق الجمل المتكررة."""
+    return " ".join(unicodedata.normalize("NFC", sentence).split())
+
+
+def _key(source, target, sentence):
+    digest = hashlib.sha256(normalize(sentence).encode("utf-8")).hexdigest()
+    return f"{source or 'auto'}:{target}:{digest}"
+
+
+def lookup(sentences, target, source="auto"):
+    """إرجاع dict {الجملة: الترجمة} للجمل الموجودة في الذاكرة فقط."""
+    if not sentences:
+        return {}
+    keys = {_key(source, target, s): s for s in set(sentences)}
+    found = {}
+    now = time.time()
+    with _db() as conn:
+        items = list(keys)
+        # SQLite يحدّ عدد المتغيرات في الاستعلام الواحد
+        for i in range(0, len(items), 500):
+            part = items[i:i + 500]
+            marks = ",".join("?" * len(part))
+            for key, translated, created_at in conn.execute(
+                f"SELECT key, translated, created_at FROM tm WHERE key IN ({marks})", part
+            ):
+                if now - created_at <= TTL_SECONDS:
+                    found[keys[key]] = translated
+            conn.execute(
+                f"UPDATE tm SET last_access = ? WHERE key IN ({marks})", [now] + part
+            )
+    with _lock:
+        _stats["hits"] += len(found)
+        _stats["misses"] += len(keys) - len(found)
+    return found
+
+
+def store(pairs, target, source="auto"):
+    """تخزين أزواج (الجملة، الترجمة)."""
+    global _writes_since_evict
+    if not pairs:
+        return
+    now = time.time()
+    rows = [
+        (_key(source, target, s), source or "auto", target, normalize(s), t, now, now)
+        for s, t in pairs if s.strip() and t
+    ]
+    with _db() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO tm (key, source, target, text, translated, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        with _lock:
+            _stats["stores"] += len(rows)
+            _writes_since_evict += len(rows)
+            due = _writes_since_evict >= EVICT_EVERY
+            if due:
+                _writes_since_evict = 0
+        if due:
+            _evict(conn)
+
+
+def _evict(conn):
+    expired = conn.execute("DELETE FROM tm WHERE created_at < ?", (time.time() - TTL_SECONDS,)).rowcount
+    count = conn.execute("SELECT COUNT(*) FROM tm").fetchone()[0]
+    overflow = max(0, count - MAX_ENTRIES)
+    if overflow:
+        conn.execute(
+            "DELETE FROM tm WHERE key IN (SELECT key FROM tm ORDER BY last_access ASC LIMIT ?)",
+            (overflow,)
+        )
+    with _lock:
+        _stats["evictions"] += expired + overflow
+
+
+def stats():
+    with _db() as conn:
+        entries = conn.execute("SELECT COUNT(*) FROM tm").fetchone()[0]
+    with _lock:
+        data = dict(_stats)
+    lookups = data["hits"] + data["misses"]
+    data["hit_rate"] = round(data["hits"] / lookups, 3) if lookups else 0.0
+    data["entries"] = entries
+    data["max_entries"] = MAX_ENTRIES
+    data["ttl_days"] = TTL_SECONDS / 86400
+    return data
@@ -0,0 +1,174 @@
+# backend/utils/tts.py
+"""
+توليد الصوت عبر Google Text-to-Speech للنصوص بأي طول:
+- تقسيم النص عند حدود الجمل ضمن حد البايتات للطلب الواحد (حد الـ API بالبايت).
+- توليد الأجزاء بالتوازي (كل طلب عبر utils.resilience).
+- دمج الأجزاء دون إعادة ترميز: MP3 وOGG تُضم إطاراتها مباشرة، وLINEAR16 يُعاد
+  بناء ترويسة WAV واحدة لها.
+- عملاء TextToSpeechClient دائمون لكل عملية (قنوات gRPC جاهزة) بدل عميل لكل طلب؛
+  يُعاد إنشاؤهم إذا تغيّر pid (بعد fork في gunicorn/celery).
+"""
+import os
+import time
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import resilience
+from utils.text_chunker import chunk_text
+
+# حد الـ API هو 5000 بايت للطلب؛ نترك هامشًا صغيرًا
+MAX_BYTES = int(os.getenv("TTS_MAX_BYTES", "4800"))
+WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+# حجم أجزاء البث: أصغر من حد الـ API حتى يبدأ التشغيل بسرعة
+STREAM_CHUNK_BYTES = int(os.getenv("TTS_STREAM_CHUNK_BYTES", "1000"))
+# عدد العملاء (القنوات) في كل عملية؛ العميل آمن للاستخدام من عدة threads
+CHANNELS = int(os.getenv("TTS_CHANNELS", "2"))
+
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="tts")
+
+_clients_lock = threading.Lock()
+_clients = []
+_clients_pid = None
+_next_client = 0
+_stats = {"requests": 0, "clients_created": 0, "reused": 0, "resets": 0, "setup_seconds": 0.0}
+
+
+def get_client():
+    """عميل TTS من مجموعة العملية (تناوب بين CHANNELS عميلًا)."""
+    global _clients, _clients_pid, _next_client
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            # القنوات لا تصلح بعد fork، لذا نبدأ مجموعة جديدة في العملية الابنة
+            if _clients_pid is not None:
+                _stats["resets"] += 1
+            _clients, _clients_pid, _next_client = [], os.getpid(), 0
+        _stats["requests"] += 1
+        if len(_clients) < max(1, CHANNELS):
+            from google.cloud import texttospeech
+
+            started = time.perf_counter()
+            client = texttospeech.TextToSpeechClient()
+            _stats["setup_seconds"] += time.perf_counter() - started
+            _stats["clients_created"] += 1
+            _clients.append(client)
+            return client
+        _stats["reused"] += 1
+        client = _clients[_next_client % len(_clients)]
+        _next_client += 1
+        return client
+
+
+def warm_up():
+    """إنشاء العملاء مسبقًا (خطوة تسخين) حتى لا يدفع أول طلب كلفة فتح القناة."""
+    with _clients_lock:
+        missing = max(1, CHANNELS) - len(_clients) if _clients_pid == os.getpid() else max(1, CHANNELS)
+    for _ in range(missing):
+        get_client()
+
+
+def stats():
+    with _clients_lock:
+        data = dict(_stats)
+        data["clients"] = len(_clients) if _clients_pid == os.getpid() else 0
+    data["setup_seconds"] = round(data["setup_seconds"], 2)
+    data["reuse_rate"] = round(data["reused"] / data["requests"], 3) if data["requests"] else 0.0
+    data["channels"] = CHANNELS
+    return data
+
+
+def _strip_id3(data):
+    """إزالة ترويسة ID3v2 من بداية جزء MP3 (إن وُجدت) قبل ضمه لما قبله."""
+    if data[:3] != b"ID3" or len(data) < 10:
+        return data
+    size = 0
+    for b in data[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    return data[10 + size:]
+
+
+def _wav_pcm(data):
+    """إرجاع (ترويسة fmt، بيانات PCM) من ملف WAV."""
+    pos, fmt, pcm = 12, b"", b""
+    while pos + 8 <= len(data):
+        chunk_id, size = data[pos:pos + 4], struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        body = data[pos + 8:pos + 8 + size]
+        if chunk_id == b"fmt ":
+            fmt = body
+        elif chunk_id == b"data":
+            pcm = body
+        pos += 8 + size + (size & 1)
+    return fmt, pcm
+
+
+def concat_audio(parts, encoding="MP3"):
+    """ضم أجزاء صوت بنفس الترميز دون إعادة ترميز."""
+    if len(parts) == 1:
+        return parts[0]
+    if encoding == "LINEAR16":
+        fmt, _ = _wav_pcm(parts[0])
+        pcm = b"".join(_wav_pcm(part)[1] for part in parts)
+        body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(pcm)) + pcm
+        return b"RIFF" + struct.pack("<I", len(body)) + body
+    if encoding == "MP3":
+        return parts[0] + b"".join(_strip_id3(part) for part in parts[1:])
+    # OGG_OPUS وما شابهه: تسلسل عدة تدفقات Ogg مدعوم في المشغلات (chained streams)
+    return b"".join(parts)
+
+
+def _synthesize_chunk(text, voice, audio_config):
+    from google.cloud import texttospeech
+
+    # كل جزء يأخذ عميلًا من المجموعة حتى تتوزع الأجزاء المتوازية على القنوات
+    response = resilience.call(
+        "tts", get_client().synthesize_speech,
+        input=texttospeech.SynthesisInput(text=text), voice=voice, audio_config=audio_config
+    )
+    return response.audio_content
+
+
+def _voice_and_config(language_code, gender, encoding):
+    from google.cloud import texttospeech
+
+    voice = texttospeech.VoiceSelectionParams(
+        language_code=language_code,
+        ssml_gender=getattr(texttospeech.SsmlVoiceGender, (gender or "NEUTRAL").upper(),
+                            texttospeech.SsmlVoiceGender.NEUTRAL)
+    )
+    audio_config = texttospeech.AudioConfig(audio_encoding=getattr(texttospeech.AudioEncoding, encoding))
+    return voice, audio_config
+
+
+def synthesize(text, language_code, gender="NEUTRAL", encoding="MP3"):
+    """توليد صوت النص كاملًا وإرجاع البايتات بالترميز المطلوب."""
+    voice, audio_config = _voice_and_config(language_code, gender, encoding)
+    chunks = chunk_text(text, MAX_BYTES, unit="bytes") or [text]
+    if len(chunks) == 1:
+        parts = [_synthesize_chunk(chunks[0], voice, audio_config)]
+    else:
+        futures = [_pool.submit(_synthesize_chunk, chunk, voice, audio_config) for chunk in chunks]
+        parts = [future.result() for future in futures]
+    return concat_audio(parts, encoding)
+
+
+def iter_synthesize(text, language_code, gender="NEUTRAL", chunk_bytes=STREAM_CHUNK_BYTES):
+    """
+    توليد MP3 على شكل أجزاء متتالية قابلة للتشغيل فور وصولها (للبث):
+    الأجزاء تُولَّد بالتوازي (نافذة محدودة) وتُعاد بالترتيب، وضمّها كما هي يعطي
+    ملف MP3 صالحًا.
+    """
+    voice, audio_config = _voice_and_config(language_code, gender, "MP3")
+    chunks = chunk_text(text, min(chunk_bytes, MAX_BYTES), unit="bytes") or [text]
+    window = max(1, WORKERS * 2)
+    futures = [_pool.submit(_synthesize_chunk, chunk, voice, audio_config) for chunk in chunks[:window]]
+    try:
+        for i in range(len(chunks)):
+            part = futures[i].result()
+            if i + window < len(chunks):
+                futures.append(_pool.submit(_synthesize_chunk, chunks[i + window], voice, audio_config))
+            yield part if i == 0 else _strip_id3(part)
+    finally:
+        # إذا انقطع العميل نلغي الأجزاء التي لم تبدأ بعد
+        for future in futures:
+            future.cancel()
+
@@ -0,0 +1,190 @@
+# backend/utils/tts_cache.py
+"""
+كاش ملفات الصوت المولّدة (TTS) حسب المحتوى:
+- المفتاح: بصمة النص بعد التطبيع + رمز اللغة + الجنس + ترميز الصوت.
+- الملفات محفوظة في CACHE_DIR ويخدمها مسار /output/audio/tts-cache/ في app.py،
+  لذا يُعاد رابط الملف الموجود مباشرة عند الإصابة.
+- إخلاء LRU عند تجاوز الحجم الكلي TTS_CACHE_MAX_MB.
+"""
+import os
+import time
+import shutil
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from utils import tts
+from utils.translation_memory import normalize
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+# بجانب مجلد الصوت الذي تكتب فيه مسارات التوليد (routes/*: BASE_DIR/audio)
+CACHE_DIR = os.getenv(
+    "TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "audio", "tts-cache")
+)
+CACHE_URL = "/output/audio/tts-cache"
+CACHE_DB = os.getenv("TTS_CACHE_DB", os.path.join(BASE_DIR, "data", "tts_cache.db"))
+MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+
+EXTENSIONS = {"MP3": "mp3", "OGG_OPUS": "ogg", "LINEAR16": "wav"}
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_init_lock = threading.Lock()
+_ready = False
+
+
+@contextmanager
+def _db():
+    if not _ready:
+        _init()
+    conn = sqlite3.connect(CACHE_DB, timeout=30)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _init():
+    """إنشاء المجلد والجداول مرة واحدة عند أول استخدام (لا عند الاستيراد)."""
+    global _ready
+    if _ready:
+        return
+    with _init_lock:
+        if _ready:
+            return
+        os.makedirs(os.path.dirname(CACHE_DB), exist_ok=True)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(CACHE_DB, timeout=30)
+        try:
+            with conn:
+                conn.execute("""
+                CREATE TABLE IF NOT EXISTS tts_cache (
+                    key TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    gender TEXT NOT NULL,
+                    encoding TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                """)
+        finally:
+            conn.close()
+        _ready = True
+
+
+def cache_key(text, language_code, gender="NEUTRAL", encoding="MP3"):
+    payload = "\x1f".join([
+        normalize(text), language_code, (gender or "NEUTRAL").upper(), encoding
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def url_for(path):
+    return f"{CACHE_URL}/{os.path.basename(path)}"
+
+
+def _lookup(key):
+    with _db() as conn:
+        row = conn.execute("SELECT filename FROM tts_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        path = os.path.join(CACHE_DIR, row[0])
+        if not os.path.exists(path):
+            conn.execute("DELETE FROM tts_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE tts_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+        return path
+
+
+def _evict(conn):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM tts_cache").fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+    evicted = 0
+    for key, filename, size in conn.execute(
+        "SELECT key, filename, size FROM tts_cache ORDER BY last_access ASC"
+    ).fetchall():
+        if total <= MAX_BYTES:
+            break
+        try:
+            os.remove(os.path.join(CACHE_DIR, filename))
+        except FileNotFoundError:
+            pass
+        conn.execute("DELETE FROM tts_cache WHERE key = ?", (key,))
+        total -= size
+        evicted += 1
+    with _lock:
+        _stats["evictions"] += evicted
+
+
+def lookup(text, language_code, gender="NEUTRAL", encoding="MP3"):
+    """مسار ملف الصوت المخزّن لهذا النص والصوت، أو None."""
+    path = _lookup(cache_key(text, language_code, (gender or "NEUTRAL").upper(), encoding))
+    with _lock:
+        _stats["hits" if path is not None else "misses"] += 1
+    return path
+
+
+def store(text, language_code, gender, encoding, audio_content):
+    """حفظ صوت مولَّد في الكاش (كتابة ذرية) وإرجاع مساره."""
+    _init()
+    gender = (gender or "NEUTRAL").upper()
+    key = cache_key(text, language_code, gender, encoding)
+    filename = f"{key[:32]}.{EXTENSIONS.get(encoding, 'bin')}"
+    path = os.path.join(CACHE_DIR, filename)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(audio_content)
+    os.replace(tmp_path, path)
+
+    now = time.time()
+    with _db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO tts_cache (key, filename, language, gender, encoding, size, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, filename, language_code, gender, encoding, len(audio_content), now, now)
+        )
+        _evict(conn)
+    return path
+
+
+def cached_synthesize(text, language_code, gender="NEUTRAL", encoding="MP3"):
+    """
+    إرجاع (مسار ملف الصوت داخل الكاش، هل كان موجودًا).
+    عند عدم وجوده يُولَّد عبر utils.tts ويُحفظ.
+    """
+    path = lookup(text, language_code, gender, encoding)
+    if path is not None:
+        return path, True
+    audio_content = tts.synthesize(text, language_code, gender, encoding)
+    return store(text, language_code, gender, encoding, audio_content), False
+
+
+def synthesize_to(output_path, text, language_code, gender="NEUTRAL", encoding="MP3"):
+    """نسخ الصوت (من الكاش أو بعد توليده) إلى مسار ثابت يحتاجه المستدعي، مثل دمج الفيديو."""
+    path, cached = cached_synthesize(text, language_code, gender, encoding)
+    # ربط/نسخ إلى اسم مؤقت ثم os.replace حتى لا يرى قارئ متزامن ملفًا ناقصًا
+    tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(path, tmp_path)
+    except OSError:
+        shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, output_path)
+    return cached
+
+
+def stats():
+    with _db() as conn:
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tts_cache").fetchone()
+    with _lock:
+        data = dict(_stats)
+    lookups = data["hits"] + data["misses"]
+    data["hit_rate"] = round(data["hits"] / lookups, 3) if lookups else 0.0
+    data["entries"] = entries
+    data["size_mb"] = round(size / 1024 / 1024, 1)
+    data["max_mb"] = round(MAX_BYTES / 1024 / 1024, 1)
+    return data
@@ -0,0 +1,92 @@
+# backend/utils/warmup.py
+"""
+تحميل المكتبات والنماذج الثقيلة بعد إقلاع التطبيق بدل وقت الاستيراد:
+- STARTUP_MODE=background (الافتراضي): تسخين في thread خلفي بعد الإقلاع.
+- STARTUP_MODE=lazy: لا شيء يُحمَّل حتى أول استخدام.
+- STARTUP_MODE=eager: تحميل كل شيء قبل استقبال الطلبات (السلوك القديم).
+"""
+import os
+import sys
+import time
+import importlib
+import threading
+
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background").lower()
+# أحجام نماذج Whisper المطلوب تحميلها مسبقًا (مفصولة بفواصل)، مثل: "base,medium"
+WARMUP_MODELS = [m.strip() for m in os.getenv("WARMUP_MODELS", "base").split(",") if m.strip()]
+
+# المكتبات الثقيلة التي نراقب تحميلها
+HEAVY_MODULES = (
+    "torch", "whisper", "moviepy.editor", "yt_dlp",
+    "google.cloud.texttospeech", "celery",
+)
+
+_lock = threading.Lock()
+_tasks = []      # [(name, fn)]
+_status = {}     # name -> {"state": ..., "seconds": ...}
+_started = False
+
+
+def register(name, fn):
+    """تسجيل خطوة تسخين (تُنفَّذ بالترتيب)."""
+    with _lock:
+        _tasks.append((name, fn))
+        _status[name] = {"state": "pending"}
+
+
+def register_import(module_name):
+    register(f"import:{module_name}", lambda: importlib.import_module(module_name))
+
+
+def register_models(sizes=None):
+    def load(size):
+        from utils.whisper_registry import get_engine
+        return lambda: get_engine(size)
+
+    for size in sizes if sizes is not None else WARMUP_MODELS:
+        register(f"whisper:{size}", load(size))
+
+
+def _run_all():
+    for name, fn in list(_tasks):
+        with _lock:
+            _status[name] = {"state": "loading"}
+        started = time.perf_counter()
+        try:
+            fn()
+            state = "ready"
+        except Exception as e:
+            state = f"error: {e}"
+        with _lock:
+            _status[name] = {"state": state, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def start(mode=None):
+    """تشغيل خطوات التسخين حسب وضع الإقلاع (مرة واحدة لكل عملية)."""
+    global _started
+    mode = mode or STARTUP_MODE
+    with _lock:
+        if _started or mode == "lazy":
+            return
+        _started = True
+    if mode == "eager":
+        _run_all()
+    else:
+        threading.Thread(target=_run_all, name="warmup", daemon=True).start()
+
+
+def status():
+    """حالة الجاهزية: خطوات التسخين، المكتبات المحمّلة والنماذج الموجودة في الذاكرة."""
+    from utils.whisper_registry import stats as model_stats
+
+    with _lock:
+        steps = {name: dict(info) for name, info in _status.items()}
+    pending = [n for n, info in steps.items() if info["state"] in ("pending", "loading")]
+    return {
+        "mode": STARTUP_MODE,
+        "ready": not pending or STARTUP_MODE == "lazy",
+        "warming": pending,
+        "steps": steps,
+        "modules": {m: m in sys.modules for m in HEAVY_MODULES},
+        "models": model_stats()["loaded"],
+    }
@@ -0,0 +1,132 @@
+# backend/utils/whisper_registry.py
+"""
+سجل مشترك لمحركات ASR (نماذج Whisper) على مستوى العملية (process):
+- يحمّل كل (backend، حجم) مرة واحدة فقط، عبر utils.asr_engine.
+- يُبقي النماذج ضمن ميزانية ذاكرة (WHISPER_RAM_BUDGET_MB) مع إخلاء LRU.
+- النماذج المحمّلة خارج العملية (عمليات utils.long_form العاملة) تُحجز من نفس الميزانية.
+- يوفّر عدّادات hit / miss / زمن التحميل.
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+# ميزانية الذاكرة بالميغابايت (افتراضيًا 8 GB)
+RAM_BUDGET_MB = int(os.getenv("WHISPER_RAM_BUDGET_MB", "8192"))
+
+# تقدير تقريبي لحجم كل نموذج في الذاكرة (fp32) قبل تحميله فعليًا
+ESTIMATED_MB = {
+    "tiny": 150, "base": 300, "small": 1000,
+    "medium": 3100, "large": 6200, "turbo": 3300,
+}
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_load_locks = {}
+_models = OrderedDict()   # (backend, size) -> (engine, size_mb)
+_reserved = {}            # اسم الحجز -> ميغابايت (نماذج في عمليات أخرى)
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "loads": 0,
+    "evictions": 0,
+    "load_seconds": 0.0,
+}
+
+
+def _estimate_mb(size):
+    return ESTIMATED_MB.get(size.split(".")[0], 1000)
+
+
+def estimate_mb(size):
+    """تقدير ذاكرة نموذج من حجمه قبل تحميله."""
+    return _estimate_mb(size)
+
+
+def _used_mb():
+    return sum(mb for _, mb in _models.values()) + sum(_reserved.values())
+
+
+def _evict_for(needed_mb):
+    """إخلاء أقدم المحركات استخدامًا حتى تتسع الميزانية للمحرك الجديد."""
+    while _models and _used_mb() + needed_mb > RAM_BUDGET_MB:
+        (backend, size), _ = _models.popitem(last=False)
+        _stats["evictions"] += 1
+        logger.info("Evicted ASR engine '%s:%s' from registry", backend, size)
+
+
+def get_engine(size="base", backend=None):
+    """إرجاع محرك ASR من الحجم المطلوب، وتحميله عند أول استخدام فقط."""
+    from utils.asr_engine import ASR_BACKEND, create_engine
+
+    key = (backend or ASR_BACKEND, size)
+    with _lock:
+        if key in _models:
+            _models.move_to_end(key)
+            _stats["hits"] += 1
+            return _models[key][0]
+        _stats["misses"] += 1
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    # قفل لكل محرك حتى لا يُحمَّل النموذج نفسه مرتين بالتوازي
+    with load_lock:
+        with _lock:
+            if key in _models:
+                _models.move_to_end(key)
+                return _models[key][0]
+            _evict_for(_estimate_mb(size))
+
+        started = time.perf_counter()
+        engine = create_engine(size, key[0])
+        elapsed = time.perf_counter() - started
+
+        with _lock:
+            size_mb = engine.memory_mb or _estimate_mb(size)
+            _evict_for(size_mb)
+            _models[key] = (engine, size_mb)
+            _stats["loads"] += 1
+            _stats["load_seconds"] += elapsed
+        logger.info("ASR engine '%s:%s' loaded in %.1fs (%.0f MB)", key[0], size, elapsed, size_mb)
+        return engine
+
+
+def reserve(name, size_mb):
+    """
+    حجز ذاكرة لنماذج تعيش خارج السجل (مثل عمليات الوضع الطويل) من نفس الميزانية،
+    مع إخلاء محركات هذه العملية إن لزم. يُرجع False إذا لم تتسع الميزانية حتى بعد الإخلاء.
+    """
+    with _lock:
+        _reserved.pop(name, None)
+        _evict_for(size_mb)
+        if _used_mb() + size_mb > RAM_BUDGET_MB:
+            return False
+        _reserved[name] = size_mb
+        return True
+
+
+def release(name):
+    with _lock:
+        _reserved.pop(name, None)
+
+
+def evict(size=None, backend=None):
+    """إخلاء محركات حجم معين (أو backend معين) أو كل المحركات."""
+    with _lock:
+        for key in list(_models):
+            if (size is None or key[1] == size) and (backend is None or key[0] == backend):
+                del _models[key]
+                _stats["evictions"] += 1
+
+
+def stats():
+    """نسخة من العدّادات الحالية مع النماذج المحمّلة واستهلاك الذاكرة."""
+    with _lock:
+        data = dict(_stats)
+        data["loaded"] = [f"{backend}:{size}" for backend, size in _models]
+        data["reserved"] = {name: round(mb, 1) for name, mb in _reserved.items()}
+        data["used_mb"] = round(_used_mb(), 1)
+        data["budget_mb"] = RAM_BUDGET_MB
+        data["load_seconds"] = round(data["load_seconds"], 2)
+        return data
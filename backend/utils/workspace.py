@@ -0,0 +1,134 @@
+# backend/utils/workspace.py
+"""
+مجلد عمل مؤقت ومعزول لكل مهمة تصيير:
+- الملفات الوسيطة (صوت مؤقت، SRT، ناتج قبل الاعتماد) تُكتب داخله فقط، فلا تتصادم
+  المهام المتزامنة على نفس الأسماء.
+- يُنشأ على /dev/shm (ذاكرة) عند توفرها ووجود مساحة كافية للحجم المتوقع، وإلا على القرص.
+- الملفات الكبيرة (path مع size_hint) يُعاد فحص المساحة لها وقت الكتابة، وتذهب
+  إلى مجلد على القرص إذا لم تعد /dev/shm تتسع لها.
+- الناتج النهائي يُنقل إلى مكانه بشكل ذري (os.replace)، والمجلد يُحذف تلقائيًا.
+"""
+import os
+import uuid
+import shutil
+import tempfile
+import threading
+
+# SCRATCH_DIR يحدد الجذر صراحةً؛ SCRATCH_TMPFS=0 يعطّل استخدام /dev/shm
+SCRATCH_DIR = os.getenv("SCRATCH_DIR")
+USE_TMPFS = os.getenv("SCRATCH_TMPFS", "1") != "0"
+TMPFS_ROOT = "/dev/shm"
+# الحد الأدنى للمساحة الحرة في /dev/shm قبل استخدامها
+TMPFS_MIN_FREE_MB = float(os.getenv("SCRATCH_TMPFS_MIN_FREE_MB", "1024"))
+# الملفات الأكبر من هذا الحد لا تُكتب في /dev/shm أبدًا
+TMPFS_MAX_FILE_MB = float(os.getenv("SCRATCH_TMPFS_MAX_FILE_MB", "2048"))
+
+_lock = threading.Lock()
+_stats = {"created": 0, "active": 0, "tmpfs": 0, "promoted": 0, "spilled": 0}
+
+
+def _disk_root():
+    return os.path.join(tempfile.gettempdir(), "echvid")
+
+
+def _tmpfs_fits(size_bytes=0):
+    """هل تتسع /dev/shm لـ size_bytes مع بقاء TMPFS_MIN_FREE_MB حرة؟"""
+    if size_bytes / 1024 / 1024 > TMPFS_MAX_FILE_MB:
+        return False
+    usage = shutil.disk_usage(TMPFS_ROOT)
+    return (usage.free - size_bytes) / 1024 / 1024 >= TMPFS_MIN_FREE_MB
+
+
+def scratch_root(expected_bytes=0):
+    """
+    اختيار جذر مجلدات العمل: SCRATCH_DIR، ثم /dev/shm إن كان فيه مساحة للحجم
+    المتوقع، ثم مجلد النظام المؤقت.
+    """
+    if SCRATCH_DIR:
+        return SCRATCH_DIR
+    if USE_TMPFS and os.path.isdir(TMPFS_ROOT) and _tmpfs_fits(expected_bytes):
+        return os.path.join(TMPFS_ROOT, "echvid")
+    return _disk_root()
+
+
+class Workspace:
+    """
+    الاستخدام:
+        with Workspace("render") as ws:
+            tmp_out = ws.path("final.mp4", size_hint=expected_size)
+            ...
+            ws.promote(tmp_out, output_path)
+    expected_bytes: تقدير لمجموع ما سيُكتب (يحدد إن كانت /dev/shm تتسع له).
+    """
+
+    def __init__(self, prefix="job", expected_bytes=0):
+        self.prefix = prefix
+        root = scratch_root(expected_bytes)
+        os.makedirs(root, exist_ok=True)
+        self.dir = tempfile.mkdtemp(prefix=f"{prefix}-", dir=root)
+        self.on_tmpfs = self.dir.startswith(TMPFS_ROOT + os.sep)
+        self._disk_dir = None
+        with _lock:
+            _stats["created"] += 1
+            _stats["active"] += 1
+            _stats["tmpfs"] += int(self.on_tmpfs)
+
+    def path(self, name, size_hint=0):
+        """
+        مسار ملف داخل مجلد العمل. size_hint (بايت) لملف كبير: تُفحص مساحة /dev/shm
+        الآن، وإن لم تعد تتسع يُعاد مسار في مجلد على القرص يُحذف مع المجلد.
+        """
+        name = os.path.basename(name)
+        if self.on_tmpfs and size_hint and not _tmpfs_fits(size_hint):
+            if self._disk_dir is None:
+                os.makedirs(_disk_root(), exist_ok=True)
+                self._disk_dir = tempfile.mkdtemp(prefix=f"{self.prefix}-", dir=_disk_root())
+                with _lock:
+                    _stats["spilled"] += 1
+            return os.path.join(self._disk_dir, name)
+        return os.path.join(self.dir, name)
+
+    def promote(self, src, dest):
+        """
+        نقل ملف من مجلد العمل إلى مكانه النهائي بشكل ذري: إذا كان على نظام ملفات آخر
+        يُنسخ أولًا إلى اسم مؤقت بجانب الوجهة ثم os.replace.
+        """
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        try:
+            os.replace(src, dest)
+        except OSError:
+            tmp_dest = f"{dest}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                shutil.copyfile(src, tmp_dest)
+                os.replace(tmp_dest, dest)
+            finally:
+                if os.path.exists(tmp_dest):
+                    os.remove(tmp_dest)
+            os.remove(src)
+        with _lock:
+            _stats["promoted"] += 1
+        return dest
+
+    def close(self):
+        if self._disk_dir:
+            shutil.rmtree(self._disk_dir, ignore_errors=True)
+            self._disk_dir = None
+        if self.dir and os.path.isdir(self.dir):
+            shutil.rmtree(self.dir, ignore_errors=True)
+            with _lock:
+                _stats["active"] -= 1
+        self.dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def stats():
+    with _lock:
+        data = dict(_stats)
+    data["root"] = scratch_root()
+    return data